@@ -0,0 +1,92 @@
+'''Generators of synthetic statements & transaction histories for benchmarks.'''
+import random
+from datetime import date, timedelta
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from tally.models import Base, Bill, Category, User, session
+from tally.parse import Transaction, number_occurrences
+
+MERCHANTS = ['TIM HORTONS', 'PETROCAN', 'SHELL', 'CANADIAN TIRE', 'ZEHRS',
+             'LOBLAWS', 'NO FRILLS', 'REN\'S PET DEPOT', 'GREASY PIZZA PLACE',
+             'AMAZON.CA', 'NETFLIX.COM', 'LCBO/RAO #123', 'UBER* TRIP', 'IKEA']
+CITIES = ['TORONTO ON', 'OTTAWA ON', 'WATERLOO ON', 'MONTREAL QC', 'VANCOUVER BC']
+CATEGORIES = ['groceries', 'gas', 'dining', 'misc', 'travel', 'bills',
+              'pets', 'gifts', 'health', 'hidden']
+PAYMENT = 'PAYMENT - THANK YOU / PAIEMENT - MERCI'
+
+
+def transactions(n_transactions: int, start: date, days: int,
+                 seed: int = 0) -> List[Transaction]:
+    '''Generate random purchases (and the odd payment) within a period.'''
+    rng = random.Random(seed)
+    generated = []
+    for _ in range(n_transactions):
+        trans_date = start + timedelta(days=rng.randrange(days))
+        if rng.random() < 0.05:
+            generated.append(Transaction(trans_date, PAYMENT,
+                                         -round(rng.uniform(50, 1000), 2)))
+        else:
+            descr = f'{rng.choice(MERCHANTS)} {rng.choice(CITIES)}'
+            generated.append(Transaction(trans_date, descr, round(rng.uniform(1, 200), 2)))
+    return generated
+
+
+def statement_text(n_transactions: int, end_date: date = date(2020, 1, 20),
+                   seed: int = 0) -> str:
+    '''Generate the text of an RBC credit card statement, as extracted by tika.'''
+    start_date = end_date - timedelta(days=33)
+    start_text = start_date.strftime('%b %d').upper()
+    if start_date.year != end_date.year:
+        start_text += f', {start_date.year}'
+    end_text = end_date.strftime('%b %d, %Y').upper()
+    lines = ['Statement', '', 'RBC Cash Back Mastercard', '',
+             f'STATEMENT FROM {start_text} TO {end_text}', '',
+             'TRANSACTION POSTING', '', 'ACTIVITY DESCRIPTION AMOUNT ($)', '']
+    for trans in transactions(n_transactions, start_date, 33, seed):
+        trans_date = trans.date.strftime('%b %d').upper()
+        posting_date = (trans.date + timedelta(days=2)).strftime('%b %d').upper()
+        sign = '-' if trans.value < 0 else ''
+        lines += [f'{trans_date} {posting_date} {trans.descr}', '',
+                  '1' * 23, '', f'{sign}${abs(trans.value):.2f}', '']
+    return '\n'.join(lines)
+
+
+def build_db(n_users: int, n_bills: int, seed: int = 0):
+    '''Replace the database with n_users, each with n_bills random bills over ten years.'''
+    Base.metadata.drop_all()
+    session.close()
+    Base.metadata.create_all()
+    rng = random.Random(seed)
+    for user_ind in range(n_users):
+        user_name = f'user{user_ind}'
+        session.add(User(name=user_name))
+        categs = [Category(name=name, user_name=user_name, hidden=name == 'hidden')
+                  for name in CATEGORIES]
+        session.add_all(categs)
+        session.flush()
+        bills = number_occurrences(transactions(
+            n_bills, date(2010, 1, 1), 3650, seed=seed + user_ind))
+        session.execute(Bill.__table__.insert(), [
+            {'date': trans.date,
+             'descr': trans.descr,
+             'value': trans.value,
+             'user_name': user_name,
+             'category_id': rng.choice(categs).id,
+             'fingerprint': trans.fingerprint()}
+            for trans in bills])
+    session.commit()
+
+
+def trans_frame(n_bills: int, seed: int = 0) -> pd.DataFrame:
+    '''Generate transaction data in the format of TransData.data, over ten years.'''
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp(2010, 1, 1) + pd.to_timedelta(
+        np.sort(rng.integers(0, 3650, n_bills)), unit='D')
+    return pd.DataFrame({
+        'Description': rng.choice(MERCHANTS, n_bills),
+        'Value': rng.uniform(1, 200, n_bills).round(2),
+        'Category': rng.choice(CATEGORIES[:-1], n_bills),
+    }, index=pd.DatetimeIndex(dates, name='Date'))
@@ -0,0 +1,237 @@
+'''Run the tally benchmark suite on synthetic data, reporting results as JSON.
+
+Benchmarks are grouped as follows, and may be selected with --only:
+    parse       extracting transactions from statement text (get_transactions)
+    categorize  bulk insertion of rule-categorized transactions (categorize)
+    review      loading & summarizing bills from the database (TransData)
+    summary     summarizing a large DataFrame in memory (summarize_all), against
+                the previous implementation (deepcopy plus per-row lambdas)
+    cli         start up time of the command line interface
+    indexes     the review benchmarks without secondary indexes (run last, as
+                the indexes are dropped)
+
+Each result holds the best wall time of several runs (ms) and, except for cli,
+the peak memory traced by a separate run (MB). Runs against the test database
+(TALLY_TESTING=1), which is overwritten.
+
+Usage (from the repository root, with tally installed):
+    python benchmarks/run.py [--users N] [--bills M] [--only GROUP ...] [--output FILE]
+'''
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from copy import deepcopy
+from datetime import date, datetime
+from importlib import metadata
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+import pandas as pd
+
+os.environ['TALLY_TESTING'] = '1'
+
+# pylint:disable=wrong-import-position
+from generate import (CATEGORIES, MERCHANTS, PAYMENT, build_db,  # noqa: E402
+                      statement_text, trans_frame, transactions)
+from tally import suggest  # noqa: E402
+from tally.categ import categorize  # noqa: E402
+from tally.context import context  # noqa: E402
+from tally.models import (ActiveUser, Bill, Category, Rule, User,  # noqa: E402
+                          engine, session)
+from tally.parse import (get_statement_dates, get_transactions,  # noqa: E402
+                         number_occurrences)
+from tally.review import (TransData, _add_averages_and_totals,  # noqa: E402
+                          summarize_monthly_totals)
+
+GROUPS = ['parse', 'categorize', 'review', 'summary', 'cli', 'indexes']
+INDEXES = ['ix_bills_user_name_date', 'ix_bills_category_id',
+           'ix_categories_user_name_hidden']
+CLI_COMMANDS = [['--help'], ['user', 'list']]
+BENCH_USER = 'bench'
+
+
+def measure(func: Callable, repeat: int = 3, setup: Optional[Callable] = None,
+            trace: bool = True) -> Dict[str, float]:
+    '''Return the best wall time (ms) of several calls of func, and the peak
+    traced memory (MB) of one more call. setup is called before each call.'''
+    best = float('inf')
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    result = {'ms': round(best * 1000, 2)}
+    if trace:
+        if setup is not None:
+            setup()
+        tracemalloc.start()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result['peak_mb'] = round(peak / 2**20, 2)
+    return result
+
+
+def bench_parse(args) -> Dict[str, Dict]:
+    '''Time extracting transactions from the text of a statement.'''
+    text = statement_text(args.transactions)
+    dates = get_statement_dates(text)
+    assert len(list(get_transactions(text, *dates))) == args.transactions
+    return {'get_transactions': measure(lambda: list(get_transactions(text, *dates)))}
+
+
+def bench_categorize(args) -> Dict[str, Dict]:
+    '''Time adding new bills for a user whose rules categorize every transaction.'''
+    session.add(User(name=BENCH_USER))
+    session.query(ActiveUser).delete()
+    session.add(ActiveUser(name=BENCH_USER))
+    categs = {name: Category(name=name, user_name=BENCH_USER) for name in CATEGORIES}
+    session.add_all(categs.values())
+    session.add_all(Rule(pattern=merchant, user_name=BENCH_USER,
+                         category=categs[CATEGORIES[ind % len(CATEGORIES)]])
+                    for ind, merchant in enumerate(MERCHANTS + [PAYMENT]))
+    session.commit()
+    new_transactions = number_occurrences(
+        transactions(args.transactions, date(2021, 1, 1), 365))
+
+    def clear_bills():
+        session.query(Bill).filter_by(user_name=BENCH_USER).delete()
+        session.commit()
+        context.reset()
+        suggest.invalidate(BENCH_USER)
+
+    result = measure(lambda: categorize(new_transactions, no_confirm=True, auto_assign=True),
+                     setup=clear_bills)
+    clear_bills()
+    return {'categorize': result}
+
+
+def bench_review(args) -> Dict[str, Dict]:
+    '''Time loading & summarizing one user's bills from the database.'''
+    user_name = f'user{args.users // 2}'
+    return {
+        'TransData': measure(lambda: TransData(user_name)),
+        'TransData (1 year)': measure(lambda: TransData(
+            user_name, start=date(2015, 1, 1), end=date(2015, 12, 31))),
+        'TransData (category)': measure(
+            lambda: TransData(user_name, category='groceries')),
+        'summarize_all': measure(lambda: TransData(user_name).summarize_all()),
+        'summarize_monthly_totals': measure(lambda: summarize_monthly_totals(user_name)),
+        'hidden categories': measure(lambda: session.query(Category).filter_by(
+            user_name=user_name, hidden=True).all()),
+    }
+
+
+def summarize_all_legacy(trans_data: TransData) -> pd.DataFrame:
+    '''The previous TransData.summarize_all, as a baseline.'''
+    data = deepcopy(trans_data.data)
+    data['Month'] = data.index.to_series().map(
+        lambda row: row.strftime('%B'))
+    data['Year'] = data.index.to_series().map(lambda row: row.year)
+    months = {date(1, month, 1).strftime('%B'): month
+              for month in range(1, 13)}
+    pivot = pd.pivot_table(data, values='Value', columns='Category',
+                           aggfunc='sum', fill_value=0, index=['Year', 'Month'])
+    pivot.sort_index(level=1, key=lambda rows: sorted(
+        rows, key=lambda row: months[row]), inplace=True)
+    pivot.sort_index(level=0, inplace=True, sort_remaining=False)
+    return _add_averages_and_totals(pivot)
+
+
+def bench_summary(args) -> Dict[str, Dict]:
+    '''Time summarizing a large DataFrame of bills, without the database, against
+    the previous implementation.'''
+    trans_data = TransData.__new__(TransData)
+    trans_data.data = trans_frame(args.frame_bills)
+    legacy = summarize_all_legacy(trans_data)
+    current = trans_data.summarize_all()
+    # the legacy month sort is not chronological, so compare by row
+    pd.testing.assert_frame_equal(legacy.loc[current.index], current)
+    return {
+        'summarize_all (legacy DataFrame)': measure(lambda: summarize_all_legacy(trans_data)),
+        'summarize_all (DataFrame)': measure(trans_data.summarize_all),
+    }
+
+
+def bench_cli(args) -> Dict[str, Dict]:  # pylint: disable=unused-argument
+    '''Time running commands in a new interpreter, as from the shell.'''
+    results = {}
+    for command in CLI_COMMANDS:
+        cmd = [sys.executable, '-c', 'from tally.cli import cli; cli()', *command]
+        results[f'tally {" ".join(command)}'] = measure(
+            lambda cmd=cmd: subprocess.run(cmd, check=True, capture_output=True),
+            repeat=5, trace=False)
+    return results
+
+
+def bench_indexes(args) -> Dict[str, Dict]:
+    '''Time the review benchmarks after dropping the secondary indexes.'''
+    with engine.begin() as conn:
+        for index in INDEXES:
+            conn.execute(f'DROP INDEX IF EXISTS "{index}"')
+    return {f'{name} (no indexes)': result
+            for name, result in bench_review(args).items()}
+
+
+BENCHMARKS = {
+    'parse': bench_parse,
+    'categorize': bench_categorize,
+    'review': bench_review,
+    'summary': bench_summary,
+    'cli': bench_cli,
+    'indexes': bench_indexes,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--bills', type=int, default=20_000,
+                        help='Number of bills per user in the database.')
+    parser.add_argument('--transactions', type=int, default=10_000,
+                        help='Number of transactions parsed & categorized.')
+    parser.add_argument('--frame_bills', type=int, default=1_000_000,
+                        help='Number of bills summarized in memory.')
+    parser.add_argument('--only', nargs='+', choices=GROUPS, default=GROUPS,
+                        help='Benchmark groups to run.')
+    parser.add_argument('--output', type=Path,
+                        help='File to write results to, instead of stdout.')
+    args = parser.parse_args()
+
+    try:
+        version = metadata.version('tally')
+    except metadata.PackageNotFoundError:
+        version = None
+    report = {
+        'tally': version,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'parameters': {name: value for name, value in vars(args).items()
+                       if name not in ['only', 'output']},
+        'results': {},
+    }
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # keep classifiers of benchmark users apart from any real data
+        suggest.MODEL_DIR = Path(temp_dir)
+        build_db(args.users, args.bills)
+        for group in GROUPS:
+            if group in args.only:
+                report['results'].update(BENCHMARKS[group](args))
+
+    output = json.dumps(report, indent=2)
+    if args.output is None:
+        print(output)
+    else:
+        args.output.write_text(output + '\n')
+
+
+if __name__ == '__main__':
+    main()
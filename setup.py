@@ -10,8 +10,13 @@ setup(
         'sqlalchemy',
         'pandas',
         'tika',
+        'requests',
         'pick'
     ],
+    extras_require={
+        'pdfminer': ['pdfminer.six'],
+        'arrow': ['pyarrow'],
+    },
     entry_points='''
         [console_scripts]
         tally=tally.cli:cli
@@ -0,0 +1,141 @@
+import gzip
+import shutil
+import sqlite3
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+from . import config
+
+BACKUP_DIR = config.root / 'backups'
+BACKUP_SUFFIXES = ('.db', '.db.gz')
+
+# pages copied per step of the online backup, pausing between steps so other
+# connections can write to the database while a backup is in progress
+PAGES_PER_STEP = 1024
+STEP_SLEEP = 0.005
+
+# fast compression, so that backups of large databases remain quick
+COMPRESS_LEVEL = 1
+
+
+def create_backup(label: str = 'manual', compress: bool = True,
+                  keep: Optional[int] = config.BACKUP_KEEP) -> str:
+    '''Back up the database, keeping only the newest backups.'''
+    BACKUP_DIR.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+    suffix = '.db.gz' if compress else '.db'
+    backup_path = BACKUP_DIR / f'{stamp}-{label}{suffix}'
+    ind = 1
+    while backup_path.exists():
+        backup_path = BACKUP_DIR / f'{stamp}-{label}-{ind}{suffix}'
+        ind += 1
+
+    if compress:
+        with tempfile.TemporaryDirectory(dir=BACKUP_DIR) as temp_dir:
+            temp_path = Path(temp_dir) / 'backup.db'
+            _copy_database(_db_path(), temp_path)
+            with open(temp_path, 'rb') as src, \
+                    gzip.open(backup_path, 'wb', compresslevel=COMPRESS_LEVEL) as dst:
+                shutil.copyfileobj(src, dst)
+    else:
+        _copy_database(_db_path(), backup_path)
+    if keep is not None:
+        prune_backups(keep)
+    return f'Backup "{backup_path.name}" created successfully.'
+
+
+def auto_backup(label: str) -> Optional[str]:
+    '''Back up the database before a destructive command, unless the database
+    has not changed since the last backup.'''
+    if config.DB_PATH is None or not config.DB_PATH.exists():
+        return None
+    backups = _get_backups()
+    if backups and backups[-1].stat().st_mtime >= _db_mtime():
+        return None
+    return create_backup(label)
+
+
+def restore_backup(name: str) -> str:
+    '''Replace the contents of the database with a backup, backing up the
+    current database first.'''
+    # pylint: disable=import-outside-toplevel
+    from .context import context
+    from .models import engine, session
+
+    backup_path = _find_backup(name)
+    # skip pruning, which could otherwise delete the backup being restored
+    create_backup('pre-restore', keep=None)
+
+    # release all connections to the database before overwriting it
+    session.close()
+    engine.dispose()
+    context.reset()
+    if backup_path.name.endswith('.gz'):
+        with tempfile.TemporaryDirectory(dir=BACKUP_DIR) as temp_dir:
+            temp_path = Path(temp_dir) / 'restore.db'
+            with gzip.open(backup_path, 'rb') as src, open(temp_path, 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+            _copy_database(temp_path, _db_path())
+    else:
+        _copy_database(backup_path, _db_path())
+    return f'Backup "{backup_path.name}" restored successfully.'
+
+
+def list_backups() -> List[str]:
+    '''List all backups, oldest first, with their size.'''
+    return [f'{path.name} ({path.stat().st_size / 2**20:.1f} MB)'
+            for path in _get_backups()]
+
+
+def prune_backups(keep: int) -> int:
+    '''Delete all but the newest backups, returning the number deleted.'''
+    backups = _get_backups()
+    old_backups = backups[:max(len(backups) - keep, 0)]
+    for path in old_backups:
+        path.unlink()
+    return len(old_backups)
+
+
+def _copy_database(src_path: Path, dst_path: Path):
+    '''Copy a database with SQLite's online backup, a few pages at a time.'''
+    src = sqlite3.connect(src_path)
+    dst = sqlite3.connect(dst_path)
+    try:
+        with dst:
+            src.backup(dst, pages=PAGES_PER_STEP, sleep=STEP_SLEEP)
+    finally:
+        dst.close()
+        src.close()
+
+
+def _get_backups() -> List[Path]:
+    '''Get all backups, oldest first.'''
+    if not BACKUP_DIR.exists():
+        return []
+    backups = [path for path in BACKUP_DIR.iterdir()
+               if path.is_file() and path.name.endswith(BACKUP_SUFFIXES)]
+    return sorted(backups, key=lambda path: (path.stat().st_mtime_ns, path.name))
+
+
+def _find_backup(name: str) -> Path:
+    '''Find a backup by file name (see list_backups) or path.'''
+    for path in [BACKUP_DIR / name, Path(name)]:
+        if path.is_file():
+            return path
+    raise FileNotFoundError(f'Backup "{name}" not found.')
+
+
+def _db_path() -> Path:
+    '''Get the path of the database file.'''
+    if config.DB_PATH is None:
+        raise RuntimeError(f'Backups require a sqlite database file, not "{config.DB_URL}".')
+    return config.DB_PATH
+
+
+def _db_mtime() -> float:
+    '''Get the last time the database (or its write-ahead log) was modified.'''
+    db_path = _db_path()
+    paths = [db_path, db_path.with_name(db_path.name + '-wal')]
+    return max(path.stat().st_mtime for path in paths if path.exists())
@@ -0,0 +1,77 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+from . import config
+
+CACHE_DIR = config.root / 'cache'
+
+
+def file_hash(url: Union[str, Path]) -> str:
+    '''Get the sha256 hash of a file's contents.'''
+    digest = hashlib.sha256()
+    with open(url, 'rb') as file:
+        for chunk in iter(lambda: file.read(2**16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load(key: str) -> Optional[Dict]:
+    '''Load a cache entry, marking it as recently used.'''
+    path = CACHE_DIR / f'{key}.json'
+    try:
+        entry = json.loads(path.read_text(encoding='utf-8'))
+        os.utime(path)
+    except (OSError, ValueError):
+        return None
+    return entry
+
+
+def exists(key: str) -> bool:
+    '''Check for a cache entry, without loading it or marking it as used.'''
+    return (CACHE_DIR / f'{key}.json').exists()
+
+
+def save(key: str, entry: Dict):
+    '''Save a cache entry, evicting the least recently used entries if required.'''
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    path = CACHE_DIR / f'{key}.json'
+    tmp_path = path.with_suffix(f'.{os.getpid()}.tmp')
+    tmp_path.write_text(json.dumps(entry), encoding='utf-8')
+    os.replace(tmp_path, path)
+    evict()
+
+
+def evict(max_size: int = config.CACHE_MAX_SIZE):
+    '''Remove the least recently used entries until the cache fits within max_size bytes.'''
+    entries = []
+    for path in CACHE_DIR.glob('*.json'):
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_size:
+            break
+        path.unlink(missing_ok=True)
+        total -= size
+
+
+def cache_info() -> str:
+    '''Describe the contents of the cache.'''
+    sizes = [path.stat().st_size for path in CACHE_DIR.glob('*.json')]
+    return (f'{len(sizes)} cached statement(s) using {sum(sizes) / 2**20:.2f} MB '
+            f'of {config.CACHE_MAX_SIZE / 2**20:.2f} MB.\nLocation: {CACHE_DIR}')
+
+
+def clear_cache() -> str:
+    '''Remove all entries from the cache.'''
+    count = 0
+    for path in CACHE_DIR.glob('*.json'):
+        path.unlink(missing_ok=True)
+        count += 1
+    return f'{count} cached statement(s) removed.'
@@ -1,15 +1,40 @@
-from typing import List
+import re
+from datetime import date
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set
 
 from pick import pick
-
-from .models import Category, session
-from .parse import TransDict
-from .users import get_active_user, get_active_user_name
-from .utils import new_bill
-
-
-def categorize(trans_dict: TransDict, no_confirm: bool) -> str:
-    '''Interactively categorize transactions.'''
+from sqlalchemy import func
+
+from .context import CategInfo, context
+from .models import Bill, Category, Rule, session
+from .parse import StatementData, Transaction
+from .profiling import profiler
+from .rules import get_matcher
+from .statements import record_statements
+from .suggest import invalidate, load_classifier, save_classifier
+from .users import get_active_user_name
+from .utils import chunked, get_imported_fingerprints, insert_bills
+
+INSERT_BATCH_SIZE = 500
+
+
+class CategSummary(NamedTuple):
+    name: str
+    hidden: bool
+    count: int
+    total: float
+
+
+def categorize(transactions: Iterable[Transaction], no_confirm: bool,
+               auto_assign: bool = False,
+               statements: Iterable[StatementData] = ()) -> str:
+    '''Interactively categorize transactions.
+
+    Transactions matching a rule have the rule's category pre-selected, or are
+    categorized without prompting if auto_assign is set. Otherwise, the category
+    suggested by the active user's bill history is pre-selected. Transactions
+    which were previously imported are skipped, and the statements they were
+    parsed from are recorded as imported.'''
     # get active user and category list
     active_user = get_active_user_name()
     categ_list = get_categs()
@@ -21,41 +46,93 @@ def categorize(trans_dict: TransDict, no_confirm: bool) -> str:
         if not confirm_user.lower() in ['y', '']:
             return 'Process aborted during active user confirmation.'
 
-    # interactively categorize each transaction
-    new_bill_count = 0
-    while trans_dict['Date']:
-        trans = (
-            f"Active User:{active_user}\n"
-            f"Date:{trans_dict['Date'][0]}\n"
-            f"Value:{trans_dict['Value'][0]}\n"
-            f"Description: {trans_dict['Description'][0]}"
-        )
-        categ, _ = pick(categ_list, trans)
-        bill = new_bill(
-            date=trans_dict['Date'].pop(0),
-            descr=trans_dict['Description'].pop(0),
-            value=trans_dict['Value'].pop(0),
-            user_name=active_user,
-            category_name=categ
-        )
-        session.add(bill)
-        new_bill_count += 1
-    session.commit()
-    return f'{new_bill_count} transactions added successfully.'
+    # interactively categorize each transaction, adding bills in batches
+    # within a single transaction
+    categ_ids = {name: categ.id for name, categ in context.categs.items()}
+    categ_names = {categ_id: name for name, categ_id in categ_ids.items()}
+    matcher = get_matcher(active_user)
+    classifier = load_classifier(active_user)
+    new_bill_count, auto_count, skip_count = 0, 0, 0
+    added: Set[str] = set()
+    for chunk in chunked(transactions, INSERT_BATCH_SIZE):
+        # skip transactions already in the database, or earlier in this import
+        fingerprints = [trans.fingerprint() for trans in chunk]
+        imported = get_imported_fingerprints(active_user, fingerprints)
+        bills: List[Dict] = []
+        for trans, fingerprint in zip(chunk, fingerprints):
+            if fingerprint in imported or fingerprint in added:
+                skip_count += 1
+                continue
+            added.add(fingerprint)
+            categ = matcher.match(trans.descr)
+            if categ is not None and auto_assign:
+                auto_count += 1
+            else:
+                ranked = classifier.rank(trans.descr)
+                if categ is None and ranked:
+                    categ = categ_names.get(ranked[0])
+                categ = _pick_category(trans, active_user, categ_list, categ)
+            # learn from each choice, improving suggestions for later transactions
+            classifier.update([(trans.descr, categ_ids[categ])])
+            bills.append({
+                'date': trans.date,
+                'descr': trans.descr,
+                'value': trans.value,
+                'user_name': active_user,
+                'category_id': categ_ids[categ],
+                'fingerprint': fingerprint,
+            })
+        insert_bills(bills)
+        new_bill_count += len(bills)
+    with profiler.stage('categorize commit'):
+        record_statements(statements, active_user)
+        session.commit()
+    save_classifier(active_user, classifier)
+
+    msg = f'{new_bill_count} transactions added successfully'
+    if auto_count:
+        msg += f' ({auto_count} categorized by rules)'
+    msg += '.'
+    if skip_count:
+        msg += f' {skip_count} previously imported transactions skipped.'
+    return msg
+
+
+def _pick_category(trans: Transaction, active_user: str, categ_list: List[str],
+                   suggestion: Optional[str]) -> str:
+    '''Interactively pick a category for a transaction, starting from the suggestion.'''
+    msg = (
+        f"Active User:{active_user}\n"
+        f"Date:{trans.date}\n"
+        f"Value:{trans.value}\n"
+        f"Description: {trans.descr}"
+    )
+    default_index = 0 if suggestion is None else categ_list.index(suggestion)
+    categ, _ = pick(categ_list, msg, default_index=default_index)
+    return categ
 
 
 def get_categs() -> List[str]:
     '''Get all categories for the active user.'''
-    categs = get_active_user().categories
-    return [categ.name for categ in categs]  # type: ignore
+    return sorted(context.categs)
+
+
+def list_categs() -> List[CategSummary]:
+    '''List all categories for the active user, with the number and total value
+    of their bills.'''
+    rows = session.query(
+        Category.name, Category.hidden,
+        func.count(Bill.id), func.coalesce(func.sum(Bill.value), 0.0)).\
+        outerjoin(Bill, Bill.category_id == Category.id).\
+        filter(Category.user_name == get_active_user_name()).\
+        group_by(Category.id).order_by(Category.name)
+    return [CategSummary(name, bool(hidden), count, total)
+            for name, hidden, count, total in rows]
 
 
 def is_hidden(categ_name: str) -> bool:
     '''Check if a category is hidden for the active user.'''
-    state = session.query(Category).\
-        filter_by(name=categ_name, user_name=get_active_user_name()).\
-        one().hidden
-    return state
+    return context.get_categ(categ_name).hidden
 
 
 def add_categ(categ_name: str, hidden: bool = False) -> str:
@@ -66,34 +143,106 @@ def add_categ(categ_name: str, hidden: bool = False) -> str:
         hidden=hidden
     )
     session.add(new_category)
+    session.flush()
+    categ = CategInfo(new_category.id, hidden)
     session.commit()
+    context.cache_categ(categ_name, categ)
     return f'Category {categ_name} added successfully.'
 
 
 def update_categ(old_categ_name: str, new_categ_name: str) -> str:
     '''Modify an existing category's name for the active user.'''
-    categ = session.query(Category).filter_by(
-        name=old_categ_name, user_name=get_active_user_name()).one()
-    categ.name = new_categ_name
+    categ = context.get_categ(old_categ_name)
+    session.query(Category).filter_by(id=categ.id).update(
+        {'name': new_categ_name}, synchronize_session=False)
     session.commit()
+    context.uncache_categ(old_categ_name)
+    context.cache_categ(new_categ_name, categ)
     return (f'Category "{old_categ_name}" successfully updated '
             f'to "{new_categ_name}".')
 
 
 def set_categ_display(categ_name: str, hidden: bool) -> str:
     """Set the display state of a category for the active user."""
-    categ = session.query(Category).filter_by(
-        name=categ_name, user_name=get_active_user_name()).one()
-    categ.hidden = hidden
+    categ = context.get_categ(categ_name)
+    session.query(Category).filter_by(id=categ.id).update(
+        {'hidden': hidden}, synchronize_session=False)
     session.commit()
+    context.cache_categ(categ_name, categ._replace(hidden=hidden))
     state = 'disabled' if hidden else 'enabled'
     return f'Display of category "{categ_name}" successfully {state}.'
 
 
 def delete_categ(categ_name: str) -> str:
     """Delete an existing category for the active user."""
-    categ = session.query(Category).filter_by(
-        name=categ_name, user_name=get_active_user_name()).one()
-    session.delete(categ)
+    # a single delete, which the database cascades to the category's bills & rules
+    session.query(Category).filter_by(id=context.get_categ(categ_name).id).delete(
+        synchronize_session=False)
     session.commit()
+    context.uncache_categ(categ_name)
+    invalidate(get_active_user_name())
     return f'Category "{categ_name}" successfully deleted.'
+
+
+def merge_categs(src_categ_names: Iterable[str], dest_categ_name: str,
+                 dry_run: bool = False) -> str:
+    """Move all bills & rules of the source categories into the destination
+    category, and delete the source categories, for the active user."""
+    src_categ_names = list(src_categ_names)
+    if dest_categ_name in src_categ_names:
+        return f'Category "{dest_categ_name}" cannot be merged into itself.'
+    dest_id = context.get_categ(dest_categ_name).id
+    src_ids = [context.get_categ(categ_name).id for categ_name in src_categ_names]
+    src_list = ', '.join(f'"{categ_name}"' for categ_name in src_categ_names)
+    bills = session.query(Bill).filter(Bill.category_id.in_(src_ids))
+    if dry_run:
+        return f'{bills.count()} bills would be merged from {src_list} into "{dest_categ_name}".'
+
+    # set-based updates in a single transaction, leaving nothing in the source
+    # categories to cascade when they are deleted
+    moved = bills.update({'category_id': dest_id}, synchronize_session=False)
+    session.query(Rule).filter(Rule.category_id.in_(src_ids)).update(
+        {'category_id': dest_id}, synchronize_session=False)
+    session.query(Category).filter(Category.id.in_(src_ids)).delete(
+        synchronize_session=False)
+    session.commit()
+    for categ_name in src_categ_names:
+        context.uncache_categ(categ_name)
+    invalidate(get_active_user_name())
+    return f'{moved} bills merged from {src_list} into "{dest_categ_name}".'
+
+
+def recategorize(pattern: str, categ_name: str, is_regex: bool = False,
+                 from_categ_names: Iterable[str] = (), start: Optional[date] = None,
+                 end: Optional[date] = None, dry_run: bool = False) -> str:
+    """Move the active user's bills whose description contains the pattern
+    (ignoring case, as for rules) to a category.
+
+    Bills may optionally be limited to some categories and a date range (inclusive)."""
+    if is_regex:
+        try:
+            re.compile(pattern)
+        except re.error as re_err:
+            return f'Invalid regular expression "{pattern}": {re_err}.'
+        match = Bill.descr.op('REGEXP')(pattern)
+    else:
+        escaped = re.sub(r'([\\%_])', r'\\\1', pattern)
+        match = Bill.descr.ilike(f'%{escaped}%', escape='\\')
+    categ_id = context.get_categ(categ_name).id
+    bills = session.query(Bill).filter(
+        Bill.user_name == get_active_user_name(), Bill.category_id != categ_id, match)
+    from_categ_names = list(from_categ_names)
+    if from_categ_names:
+        bills = bills.filter(Bill.category_id.in_(
+            [context.get_categ(name).id for name in from_categ_names]))
+    if start is not None:
+        bills = bills.filter(Bill.date >= start)
+    if end is not None:
+        bills = bills.filter(Bill.date <= end)
+    if dry_run:
+        return f'{bills.count()} bills would be recategorized to "{categ_name}".'
+
+    moved = bills.update({'category_id': categ_id}, synchronize_session=False)
+    session.commit()
+    invalidate(get_active_user_name())
+    return f'{moved} bills recategorized to "{categ_name}".'
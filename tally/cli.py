@@ -1,20 +1,39 @@
-from typing import Tuple
+from datetime import datetime
+from typing import Optional, Tuple
 
 import click
 
-from . import categ as _categ
-from . import parse as _parse
-from . import users
-from .config import DB_URL
-from .models import init_db
-from .review import TransData
-from .utils import handle_db_session, require_active_user
+from .config import DB_PATH, EXTRACT_ENGINE, TIKA_IDLE_TIMEOUT
+from .context import context
+from .extract import ENGINES
+from .utils import backup_before, handle_db_session, require_active_user
+
+# modules are imported by the commands which use them, so that each command
+# only loads the dependencies it needs (i.e. pandas, tika, the database)
+# pylint: disable=import-outside-toplevel
 
 
 @click.group()
-def cli():
+@click.option('--profile', 'profile_path', type=click.Path(dir_okay=False),
+              envvar='TALLY_PROFILE',
+              help=('Write the time, memory & sql statements of each stage of the '
+                    'command to a json file ("-" for stderr).'))
+@click.option('--cprofile', 'cprofile_path', type=click.Path(dir_okay=False),
+              envvar='TALLY_CPROFILE', help='Write cProfile stats of the command to a file.')
+@click.pass_context
+def cli(ctx: click.Context, profile_path: Optional[str], cprofile_path: Optional[str]):
     """Parse, categorize and summarize expense data from RBC credit card statements."""
-    if not DB_URL.exists():
+    context.reset()
+    if profile_path is not None or cprofile_path is not None:
+        from .profiling import profiler
+        profiler.start(cprofile_path)
+        ctx.call_on_close(lambda: profiler.stop(profile_path))
+    if DB_PATH is None:
+        # in memory databases start empty on every invocation
+        from .models import init_db
+        init_db()
+    elif not DB_PATH.exists():
+        from .models import init_db
         print('First time setup: initializing database...', end='')
         init_db()
         print('done')
@@ -29,6 +48,7 @@ def user():
 @user.command(name='list')
 def list_users():
     """List all users. The active user is denoted by an asterisk."""
+    from . import users
     user_names = users.get_users()
     if len(user_names) == 0:
         print('No users exist yet. See option "user add" to create a new user.')
@@ -51,6 +71,7 @@ def list_users():
 @handle_db_session
 def add_user(user_names: Tuple[str], set_active: bool):
     """Add one or more users."""
+    from . import users
     for user_name in user_names:
         msg = users.add_user(user_name)
         print(msg)
@@ -64,6 +85,7 @@ def add_user(user_names: Tuple[str], set_active: bool):
 @handle_db_session
 def update_user(old_user_name: str, new_user_name: str):
     """Update a user's name."""
+    from . import users
     msg = users.update_user(old_user_name, new_user_name)
     print(msg)
 
@@ -73,8 +95,10 @@ def update_user(old_user_name: str, new_user_name: str):
 @click.confirmation_option(
     prompt='Are you sure you want to delete the specified user(s)?')
 @handle_db_session
+@backup_before
 def delete_user(user_names: Tuple[str]):
     """Delete one or more users."""
+    from . import users
     for user_name in user_names:
         msg = users.delete_user(user_name)
         print(msg)
@@ -85,6 +109,7 @@ def delete_user(user_names: Tuple[str]):
 @handle_db_session
 def active(user_name: str):
     """Set the active user."""
+    from . import users
     msg = users.set_active_user(user_name)
     print(msg)
 
@@ -96,21 +121,26 @@ def categ():
 
 
 @categ.command(name='list')
+@click.option('-d', '--details', is_flag=True,
+              help='Show the number and total value of bills in each category.')
 @require_active_user
 @handle_db_session
-def list_categs():
+def list_categs(details: bool):
     """List all categories for the active user."""
-    categ_names = _categ.get_categs()
-    if len(categ_names) == 0:
+    from . import categ as _categ
+    categ_list = _categ.list_categs()
+    if len(categ_list) == 0:
         msg = ('No categories exist yet. See command "categ add" to create '
                'a new category.')
     else:
         title = 'List of Categories:'
         msg = '\n'.join([title, '-'*len(title)]) + '\n'
-        for categ_name in categ_names:
-            msg += categ_name
-            if _categ.is_hidden(categ_name):
+        for categ_ in categ_list:
+            msg += categ_.name
+            if categ_.hidden:
                 msg += ' (hidden)'
+            if details:
+                msg += f': {categ_.count} bills, {categ_.total:.2f} total'
             msg += '\n'
     print(msg)
 
@@ -123,6 +153,7 @@ def list_categs():
 @handle_db_session
 def add_categ(categ_names: Tuple[str], hidden: bool = False):
     """Add one or more categories."""
+    from . import categ as _categ
     for categ_name in categ_names:
         msg = _categ.add_categ(categ_name, hidden)
         print(msg)
@@ -135,6 +166,7 @@ def add_categ(categ_names: Tuple[str], hidden: bool = False):
 @handle_db_session
 def update_categ(old_categ_name: str, new_categ_name: str):
     """Update a category's name."""
+    from . import categ as _categ
     msg = _categ.update_categ(old_categ_name, new_categ_name)
     print(msg)
 
@@ -145,6 +177,7 @@ def update_categ(old_categ_name: str, new_categ_name: str):
 @handle_db_session
 def show_categ(categ_names: Tuple[str]):
     """Enable display of one or more categories in summary outputs."""
+    from . import categ as _categ
     for categ_name in categ_names:
         msg = _categ.set_categ_display(categ_name, False)
         print(msg)
@@ -156,6 +189,7 @@ def show_categ(categ_names: Tuple[str]):
 @handle_db_session
 def hide_categ(categ_names: Tuple[str]):
     """Disable display of one or more categories in summary outputs."""
+    from . import categ as _categ
     for categ_name in categ_names:
         msg = _categ.set_categ_display(categ_name, True)
         print(msg)
@@ -167,23 +201,316 @@ def hide_categ(categ_names: Tuple[str]):
     prompt='Are you sure you want to delete the specified category(ies)?')
 @require_active_user
 @handle_db_session
+@backup_before
 def delete_categ(categ_names: Tuple[str]):
     """Delete one or more categories."""
+    from . import categ as _categ
     for categ_name in categ_names:
         msg = _categ.delete_categ(categ_name)
         print(msg)
 
 
+@categ.command('merge')
+@click.argument('src_categ_names', nargs=-1, required=True)
+@click.argument('dest_categ_name')
+@click.option('--dry_run', is_flag=True,
+              help='Only count the bills which would be merged.')
+@require_active_user
+@handle_db_session
+@backup_before
+def merge_categs(src_categ_names: Tuple[str], dest_categ_name: str, dry_run: bool):
+    """Move all bills & rules of one or more categories into DEST_CATEG_NAME,
+    deleting the merged categories."""
+    from . import categ as _categ
+    msg = _categ.merge_categs(src_categ_names, dest_categ_name, dry_run)
+    print(msg)
+
+
 @cli.command()
-@click.argument('filepath', type=click.Path(exists=True, dir_okay=False))
+@click.option('-m', '--match', 'pattern', required=True,
+              help='Text (or regular expression) to find in bill descriptions, ignoring case.')
+@click.option('-t', '--to', 'categ_name', required=True,
+              help='Category to move matching bills to.')
+@click.option('-f', '--from', 'from_categ_names', multiple=True,
+              help='Only move bills from this category (may be repeated).')
+@click.option('-r', '--regex', is_flag=True,
+              help='Treat the pattern as a regular expression.')
+@click.option('--since', type=click.DateTime(formats=['%Y-%m-%d']),
+              help='Only move bills on or after this date (YYYY-MM-DD).')
+@click.option('--until', type=click.DateTime(formats=['%Y-%m-%d']),
+              help='Only move bills on or before this date (YYYY-MM-DD).')
+@click.option('--dry_run', is_flag=True,
+              help='Only count the bills which would be moved.')
+@require_active_user
+@handle_db_session
+@backup_before
+def recat(pattern: str, categ_name: str, from_categ_names: Tuple[str], regex: bool,
+          since: Optional[datetime], until: Optional[datetime], dry_run: bool):
+    """Move the active user's bills matching a description to another category."""
+    from . import categ as _categ
+    msg = _categ.recategorize(
+        pattern, categ_name, regex, from_categ_names,
+        start=since.date() if since else None,
+        end=until.date() if until else None, dry_run=dry_run)
+    print(msg)
+
+
+@cli.command()
+@click.argument('filepaths', nargs=-1, required=True,
+                type=click.Path(exists=True, file_okay=True, dir_okay=True))
 @click.option('--no_confirm', is_flag=True,
               help='Do not require active user confirmation.')
+@click.option('-j', '--jobs', type=click.IntRange(min=1),
+              help='Number of statements to parse in parallel (default: all cores).')
+@click.option('-e', '--engine', type=click.Choice(list(ENGINES)),
+              default=EXTRACT_ENGINE, show_default=True,
+              help='Engine used to extract text from pdf statements.')
+@click.option('--no_cache', is_flag=True,
+              help='Re-extract statements, ignoring previously cached results.')
+@click.option('-a', '--auto', is_flag=True,
+              help='Categorize transactions matching a rule without prompting.')
+@click.option('--reimport', is_flag=True,
+              help='Parse previously imported statements again (previously '
+              'imported transactions are still skipped).')
+@click.option('--account',
+              help='Only read this account (number, or its last digits) from csv & '
+              'ofx downloads. By default, csv downloads are read for credit cards only.')
+@require_active_user
+@handle_db_session
+def parse(filepaths: Tuple[str], no_confirm: bool, jobs: int, engine: str,
+          no_cache: bool, auto: bool, reimport: bool, account: Optional[str]):
+    '''Parse & categorize one or more pdf, csv or ofx/qfx statements (or
+    directories of statements).'''
+    from . import cache
+    from . import categ as _categ
+    from . import parse as _parse
+    from . import statements as _statements
+    from . import users
+    statements = _parse.find_statements(filepaths)
+    if len(statements) == 0:
+        print('No statements found which match input.')
+        return
+
+    # hash each statement once, to check for previous imports, the statement
+    # cache and record the import
+    file_hashes = {url: cache.file_hash(url) for url in statements}
+    if not reimport:
+        statements, skipped = _statements.filter_imported(
+            statements, users.get_active_user_name(), file_hashes)
+        if skipped:
+            print(f'{skipped} previously imported statement(s) skipped.')
+        if len(statements) == 0:
+            return
+    parsed = _parse.read_statements(
+        statements, max_workers=jobs, engine=engine, use_cache=not no_cache,
+        account=account, on_error=lambda url, err: print(f'Skipped {url}: {err}'),
+        file_hashes=file_hashes)
+    if len(parsed) == 0:
+        return
+    transactions = (trans for statement in parsed for trans in statement.transactions)
+    msg = _categ.categorize(transactions, no_confirm, auto_assign=auto,
+                            statements=parsed)
+    print(msg)
+
+
+@cli.command()
+@click.option('--no_confirm', is_flag=True,
+              help='Apply changes without confirmation.')
+@click.option('--dry_run', is_flag=True,
+              help='Only show the changes which would be made.')
+@require_active_user
+@handle_db_session
+@backup_before
+def reclassify(no_confirm: bool, dry_run: bool):
+    """Re-apply rules to all bills of the active user, moving bills to the
+    category of the rule matching their description."""
+    from . import reclassify as _reclassify
+    msg = _reclassify.reclassify(no_confirm, dry_run)
+    print(msg)
+
+
+@cli.command(name='export')
+@click.argument('filepath', type=click.Path(dir_okay=False))
+@require_active_user
+@handle_db_session
+def export_bills(filepath: str):
+    """Export all bills for the active user to a parquet (.parquet) or arrow
+    (.arrow/.feather) file."""
+    from . import export
+    try:
+        msg = export.export_bills(filepath)
+    except (ValueError, RuntimeError) as err:
+        msg = str(err)
+    print(msg)
+
+
+@cli.command(name='import')
+@click.argument('filepath', type=click.Path(exists=True, dir_okay=False))
+@require_active_user
+@handle_db_session
+def import_bills(filepath: str):
+    """Import bills for the active user from a file created by "export", skipping
+    previously imported bills."""
+    from . import export
+    from .models import session
+    try:
+        msg = export.import_bills(filepath)
+    except (ValueError, RuntimeError) as err:
+        # discard any bills & categories added prior to the error
+        session.rollback()
+        context.reset()
+        msg = f'{err} No bills imported.'
+    print(msg)
+
+
+@cli.group()
+def rule():
+    """Manage rules which suggest categories from transaction descriptions."""
+    pass
+
+
+@rule.command(name='list')
+@require_active_user
+@handle_db_session
+def list_rules():
+    """List all rules for the active user."""
+    from . import rules
+    rule_list = rules.get_rules()
+    if len(rule_list) == 0:
+        msg = 'No rules exist yet. See command "rule add" to create a new rule.'
+    else:
+        title = 'List of Rules:'
+        msg = '\n'.join([title, '-'*len(title)]) + '\n'
+        for rule_ in rule_list:
+            regex = ' (regex)' if rule_.is_regex else ''
+            msg += f'{rule_.id}: "{rule_.pattern}"{regex} -> {rule_.category.name}\n'
+    print(msg)
+
+
+@rule.command(name='add')
+@click.argument('pattern')
+@click.argument('categ_name')
+@click.option('-r', '--regex', is_flag=True,
+              help='Treat pattern as a regular expression, rather than text.')
+@require_active_user
+@handle_db_session
+def add_rule(pattern: str, categ_name: str, regex: bool):
+    """Add a rule assigning transactions whose description contains PATTERN
+    (ignoring case) to category CATEG_NAME."""
+    from . import rules
+    msg = rules.add_rule(pattern, categ_name, regex)
+    print(msg)
+
+
+@rule.command(name='delete')
+@click.argument('rule_ids', nargs=-1, type=int)
 @require_active_user
 @handle_db_session
-def parse(filepath: str, no_confirm: bool):
-    '''Parse & categorize a pdf statement.'''
-    trans_dict = _parse.parse_statement(filepath)
-    msg = _categ.categorize(trans_dict, no_confirm)
+def delete_rule(rule_ids: Tuple[int]):
+    """Delete one or more rules, by id (see "rule list")."""
+    from . import rules
+    for rule_id in rule_ids:
+        msg = rules.delete_rule(rule_id)
+        print(msg)
+
+
+@cli.group(name='backup')
+def backup_group():
+    """Back up & restore the database."""
+    pass
+
+
+@backup_group.command(name='create')
+@click.option('-l', '--label', default='manual', show_default=True,
+              help='Label added to the backup file name.')
+@click.option('--no_compress', is_flag=True, help='Do not compress the backup.')
+def create_backup(label: str, no_compress: bool):
+    """Back up the database, deleting the oldest backups beyond the limit
+    (TALLY_BACKUP_KEEP)."""
+    from . import backup
+    msg = backup.create_backup(label, compress=not no_compress)
+    print(msg)
+
+
+@backup_group.command(name='list')
+def list_backups():
+    """List all backups, oldest first."""
+    from . import backup
+    backup_names = backup.list_backups()
+    if len(backup_names) == 0:
+        print('No backups exist yet. See command "backup create" to create a backup.')
+        return None
+    title = 'List of Backups:'
+    print('\n'.join([title, '-'*len(title), *backup_names]))
+
+
+@backup_group.command(name='restore')
+@click.argument('backup_name')
+@click.confirmation_option(
+    prompt='Are you sure you want to replace the database with the specified backup?')
+def restore_backup(backup_name: str):
+    """Restore the database from a backup (see "backup list"), after backing up
+    the current database."""
+    from . import backup
+    try:
+        msg = backup.restore_backup(backup_name)
+    except FileNotFoundError as fnf_err:
+        msg = f'{fnf_err} See command "backup list" for available backups.'
+    print(msg)
+
+
+@cli.group(name='cache')
+def cache_group():
+    """Manage the cache of previously parsed statements."""
+    pass
+
+
+@cache_group.command(name='info')
+def cache_info():
+    """Show the size and location of the cache."""
+    from . import cache
+    msg = cache.cache_info()
+    print(msg)
+
+
+@cache_group.command(name='clear')
+def clear_cache():
+    """Remove all previously parsed statements from the cache."""
+    from . import cache
+    msg = cache.clear_cache()
+    print(msg)
+
+
+@cli.group()
+def tika():
+    """Manage the background Tika server used to read pdf statements."""
+    pass
+
+
+@tika.command(name='start')
+@click.option('-t', '--idle_timeout', type=click.IntRange(min=1),
+              default=TIKA_IDLE_TIMEOUT, show_default=True,
+              help='Seconds of inactivity after which the server shuts down.')
+def start_tika(idle_timeout: int):
+    """Start the Tika server, keeping it warm between commands."""
+    from . import tika_server
+    msg = tika_server.start_server(idle_timeout)
+    print(msg)
+
+
+@tika.command(name='stop')
+def stop_tika():
+    """Stop the Tika server."""
+    from . import tika_server
+    msg = tika_server.stop_server()
+    print(msg)
+
+
+@tika.command(name='status')
+def tika_status():
+    """Check whether the Tika server is running."""
+    from . import tika_server
+    msg = tika_server.server_status()
     print(msg)
 
 
@@ -194,12 +521,35 @@ def parse(filepath: str, no_confirm: bool):
               help='Show hidden categories in output.')
 @click.option('-c', '--category', help='List transactions for specified category.',
               type=click.STRING)
+@click.option('--since', type=click.DateTime(formats=['%Y-%m-%d']),
+              help='Only include transactions on or after this date (YYYY-MM-DD).')
+@click.option('--until', type=click.DateTime(formats=['%Y-%m-%d']),
+              help='Only include transactions on or before this date (YYYY-MM-DD).')
 @require_active_user
-def review(filter_edges: bool, category: str, show_hidden: bool):
+def review(filter_edges: bool, category: str, show_hidden: bool,
+           since: Optional[datetime], until: Optional[datetime]):
     """Review transaction data for the active user."""
-    # get active user data
+    from . import users
+    from .review import TransData, summarize_monthly_totals
     active_user = users.get_active_user_name()
-    trans_data = TransData(active_user, show_hidden=show_hidden)
+
+    # the full summary is read from the monthly totals maintained by the database
+    if not (category or since or until):
+        try:
+            summary = summarize_monthly_totals(active_user, show_hidden, filter_edges)
+        except ValueError as v_err:
+            print(f'{v_err} Try re-issueing without the "--filter_edges" option.\n')
+            return
+        print(f'Monthly spending summary:\n{summary}', '\n', sep='')
+        return
+
+    # get active user data (the first and last month are determined from all
+    # categories, so only load the specified category if not filtering edges)
+    trans_data = TransData(
+        active_user, show_hidden=show_hidden,
+        start=since.date() if since else None,
+        end=until.date() if until else None,
+        category=None if filter_edges else category)
 
     # filter first and last month's data if applicable
     if filter_edges:
@@ -216,3 +566,25 @@ def review(filter_edges: bool, category: str, show_hidden: bool):
     else:
         msg = f'Monthly spending summary:\n{trans_data.summarize_all()}'
     print(msg, '\n', sep='')
+
+
+@cli.group(name='totals')
+def totals_group():
+    """Check & rebuild the monthly totals used by the review summary."""
+    pass
+
+
+@totals_group.command()
+@handle_db_session
+def check():
+    """Check the monthly totals against the bills they are computed from."""
+    from . import totals
+    print(totals.check_totals())
+
+
+@totals_group.command()
+@handle_db_session
+def rebuild():
+    """Recompute the monthly totals from all bills."""
+    from . import totals
+    print(totals.rebuild_totals())
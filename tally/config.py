@@ -1,12 +1,98 @@
 import os
+import sys
+from configparser import ConfigParser
 from pathlib import Path
+from typing import Dict, Optional
 
-root = Path.home() / 'AppData/Local/tally'
+
+def _default_root() -> Path:
+    '''Get the platform's directory for application data.'''
+    legacy = Path.home() / 'AppData/Local/tally'
+    if sys.platform == 'win32':
+        base = Path(os.environ.get('LOCALAPPDATA', Path.home() / 'AppData/Local'))
+    elif sys.platform == 'darwin':
+        base = Path.home() / 'Library/Application Support'
+    else:
+        base = Path(os.environ.get('XDG_DATA_HOME', Path.home() / '.local/share'))
+    # keep using data created by earlier versions, which used the windows path everywhere
+    if not (base / 'tally').exists() and legacy.exists():
+        return legacy
+    return base / 'tally'
+
+
+root = Path(os.environ.get('TALLY_HOME', _default_root())).expanduser()
 if not root.exists():
     root.mkdir(parents=True)
 
-# conditionally switch to testing database based on environment variable
+# optional settings file (ini format), overridden by environment variables, e.g.
+#   [tally]
+#   db_path = ~/finances/tally.db
+#   extract_engine = pdfminer
+#   [sqlite]
+#   synchronous = FULL
+CONFIG_FILE = Path(os.environ.get('TALLY_CONFIG', root / 'config.ini')).expanduser()
+_parser = ConfigParser()
+_parser.read(CONFIG_FILE)
+
+
+def _setting(name: str, default: Optional[str] = None) -> Optional[str]:
+    '''Get a setting from the environment (TALLY_<NAME>), else the config file.'''
+    return os.environ.get(f'TALLY_{name.upper()}',
+                          _parser.get('tally', name, fallback=default))
+
+
+def _int_setting(name: str, default: int) -> int:
+    '''Get an integer setting from the environment (TALLY_<NAME>), else the config file.'''
+    value = _setting(name, str(default))
+    try:
+        return int(str(value))
+    except ValueError as val_err:
+        raise ValueError(f'Invalid setting {name} = "{value}", expected an integer.') \
+            from val_err
+
+
+# database location, either a sqlite file path or a sqlite url (the schema's
+# triggers, pragmas & regexp function are specific to sqlite), and the testing
+# database, selected by environment variable
+DB_PATH: Optional[Path]
 if os.environ.get('TALLY_TESTING') == '1':
-    DB_URL = root / 'test.db'
+    DB_PATH = root / 'test.db'
+    DB_URL = f'sqlite:///{DB_PATH}'
+elif _setting('db_url') is not None:
+    DB_URL = str(_setting('db_url'))
+    _scheme, _, _location = DB_URL.partition('://')
+    if _scheme.split('+')[0] != 'sqlite':
+        raise ValueError(f'Unsupported database url "{DB_URL}". Tally requires a sqlite '
+                         'database, e.g. "sqlite:///path/to/tally.db".')
+    # in memory databases have no file path
+    _location = _location[1:].split('?')[0]
+    DB_PATH = Path(_location) if _location not in ['', ':memory:'] else None
 else:
-    DB_URL = root / 'tally.db'
+    DB_PATH = Path(str(_setting('db_path', str(root / 'tally.db')))).expanduser()
+    DB_URL = f'sqlite:///{DB_PATH}'
+
+# connection settings for sqlite databases (see https://sqlite.org/pragma.html),
+# favouring fast bulk imports: a write-ahead log synced at checkpoints, 64 MB page
+# cache, 256 MB memory mapped io and temporary tables in memory
+SQLITE_PRAGMAS: Dict[str, str] = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': str(-64 * 2**10),
+    'mmap_size': str(256 * 2**20),
+    'temp_store': 'MEMORY',
+}
+if _parser.has_section('sqlite'):
+    SQLITE_PRAGMAS.update(_parser.items('sqlite'))
+
+# engine used to extract text from pdf statements (see tally.extract.ENGINES)
+EXTRACT_ENGINE = str(_setting('extract_engine', 'tika'))
+
+# maximum size of the cache of parsed statements, in bytes
+CACHE_MAX_SIZE = _int_setting('cache_max_size', 50 * 2**20)
+
+# local tika server, kept running between invocations until idle for the timeout
+TIKA_PORT = _int_setting('tika_port', 9998)
+TIKA_IDLE_TIMEOUT = _int_setting('tika_idle_timeout', 30 * 60)
+
+# number of database backups kept, deleting the oldest backups beyond this
+BACKUP_KEEP = _int_setting('backup_keep', 10)
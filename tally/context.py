@@ -0,0 +1,99 @@
+from typing import Dict, NamedTuple, Optional
+
+# database modules are imported by the methods which use them, so that the cli
+# can reset the context without loading sqlalchemy or the database
+# pylint: disable=import-outside-toplevel
+
+
+class CategInfo(NamedTuple):
+    id: int
+    hidden: bool
+
+
+class Context():
+    '''
+    A class used to cache lookups of the active user and their categories, so
+    they are queried at most once per command.
+
+    Lookups are loaded on first use, and must be reset or updated after writes
+    which change them.
+
+    Attributes
+    ----------
+    active_user_name : str
+        Name of the active user
+    categs : Dict[str, CategInfo]
+        The id & display state of each of the active user's categories, by name
+
+    Methods
+    -------
+    reset()
+        Discard all cached lookups.
+    active_user_exists()
+        Check for existance of active user.
+    get_categ(categ_name: str)
+        Get the id & display state of one of the active user's categories.
+    cache_categ(categ_name: str, categ: CategInfo)
+        Record a new or modified category, if categories are loaded.
+    uncache_categ(categ_name: str)
+        Forget a renamed or deleted category, if categories are loaded.
+
+    '''
+
+    def __init__(self):
+        self._active_user_name: Optional[str] = None
+        self._active_user_loaded = False
+        self._categs: Optional[Dict[str, CategInfo]] = None
+
+    def reset(self):
+        '''Discard all cached lookups.'''
+        self.__init__()  # pylint: disable=unnecessary-dunder-call
+
+    def active_user_exists(self) -> bool:
+        '''Check for existance of active user.'''
+        if not self._active_user_loaded:
+            from .models import ActiveUser, session
+            self._active_user_name = session.query(ActiveUser.name).scalar()
+            self._active_user_loaded = True
+        return self._active_user_name is not None
+
+    @property
+    def active_user_name(self) -> str:
+        '''Name of the active user.'''
+        if not self.active_user_exists():
+            from sqlalchemy.orm.exc import NoResultFound
+            raise NoResultFound('No active user set.')
+        return self._active_user_name  # type: ignore
+
+    @property
+    def categs(self) -> Dict[str, CategInfo]:
+        '''The id & display state of each of the active user's categories, by name.'''
+        if self._categs is None:
+            from .models import Category, session
+            rows = session.query(Category.name, Category.id, Category.hidden).\
+                filter_by(user_name=self.active_user_name)
+            self._categs = {name: CategInfo(categ_id, bool(hidden))
+                            for name, categ_id, hidden in rows}
+        return self._categs
+
+    def get_categ(self, categ_name: str) -> CategInfo:
+        '''Get the id & display state of one of the active user's categories.'''
+        try:
+            return self.categs[categ_name]
+        except KeyError:
+            from sqlalchemy.orm.exc import NoResultFound
+            raise NoResultFound(f'No category "{categ_name}".') from None
+
+    def cache_categ(self, categ_name: str, categ: CategInfo):
+        '''Record a new or modified category, if categories are loaded.'''
+        if self._categs is not None:
+            self._categs[categ_name] = categ
+
+    def uncache_categ(self, categ_name: str):
+        '''Forget a renamed or deleted category, if categories are loaded.'''
+        if self._categs is not None:
+            self._categs.pop(categ_name, None)
+
+
+# lookups for the current command
+context = Context()
@@ -0,0 +1,155 @@
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterator, List, Set, Union
+
+from .context import CategInfo, context
+from .models import Bill, Category, session
+from .parse import Transaction
+from .suggest import invalidate
+from .users import get_active_user_name
+from .utils import chunked, get_imported_fingerprints, insert_bills
+
+# pyarrow is an optional dependency, imported by the functions which use it
+# pylint: disable=import-outside-toplevel
+
+CHUNK_SIZE = 10_000
+PARQUET_SUFFIXES = ('.parquet', '.pq')
+ARROW_SUFFIXES = ('.arrow', '.feather', '.ipc')
+COLUMNS = ['date', 'descr', 'value', 'category', 'fingerprint']
+
+
+def _import_pyarrow():
+    '''Import pyarrow, which is an optional dependency.'''
+    try:
+        import pyarrow
+    except ImportError as imp_err:
+        raise RuntimeError(
+            'Exporting & importing bills requires the pyarrow package. '
+            'Install it with "pip install pyarrow".') from imp_err
+    return pyarrow
+
+
+def _get_format(url: Path) -> str:
+    '''Get the file format from the suffix of the file name.'''
+    suffix = url.suffix.lower()
+    if suffix in PARQUET_SUFFIXES:
+        return 'parquet'
+    if suffix in ARROW_SUFFIXES:
+        return 'arrow'
+    raise ValueError(f'Unknown file type "{url.suffix}". Valid options: '
+                     f'{", ".join(PARQUET_SUFFIXES + ARROW_SUFFIXES)}.')
+
+
+def _schema():
+    '''Get the arrow schema of exported bills.'''
+    pa = _import_pyarrow()
+    return pa.schema([
+        ('date', pa.date32()),
+        ('descr', pa.string()),
+        ('value', pa.float64()),
+        ('category', pa.string()),
+        ('fingerprint', pa.string()),
+    ])
+
+
+def export_bills(url: Union[str, Path], chunk_size: int = CHUNK_SIZE) -> str:
+    '''Export all bills of the active user to a parquet or arrow (IPC) file.
+
+    Bills are written one chunk (row group / record batch) at a time.'''
+    pa = _import_pyarrow()
+    url = Path(url)
+    file_format = _get_format(url)
+    schema = _schema()
+    rows = session.query(
+        Bill.date, Bill.descr, Bill.value, Category.name, Bill.fingerprint).\
+        join(Category, Bill.category_id == Category.id).\
+        filter(Bill.user_name == get_active_user_name()).\
+        order_by(Bill.date, Bill.id).yield_per(chunk_size)
+
+    if file_format == 'parquet':
+        import pyarrow.parquet as pq
+        writer = pq.ParquetWriter(url, schema)
+    else:
+        writer = pa.ipc.new_file(url, schema)
+    count = 0
+    with writer:
+        for chunk in chunked(rows, chunk_size):
+            columns = [list(column) for column in zip(*chunk)]
+            writer.write_batch(pa.RecordBatch.from_arrays(columns, schema=schema))
+            count += len(chunk)
+    return f'{count} bills exported successfully to "{url}".'
+
+
+def _read_batches(url: Path, chunk_size: int) -> Iterator:
+    '''Read a parquet or arrow (IPC) file, one record batch at a time.'''
+    pa = _import_pyarrow()
+    if _get_format(url) == 'parquet':
+        import pyarrow.parquet as pq
+        yield from pq.ParquetFile(url).iter_batches(batch_size=chunk_size)
+    else:
+        with pa.ipc.open_file(url) as reader:
+            for ind in range(reader.num_record_batches):
+                yield reader.get_batch(ind)
+
+
+def import_bills(url: Union[str, Path], chunk_size: int = CHUNK_SIZE) -> str:
+    '''Import bills from a parquet or arrow (IPC) file for the active user.
+
+    Missing categories are created, and previously imported bills are skipped.'''
+    url = Path(url)
+    active_user = get_active_user_name()
+    occurrences: Counter = Counter()
+    added: Set[str] = set()
+    new_bill_count, skip_count = 0, 0
+    for batch in _read_batches(url, chunk_size):
+        columns = batch.to_pydict()
+        missing = [column for column in COLUMNS[:4] if column not in columns]
+        if missing:
+            raise ValueError(f'Missing column(s) in "{url}": {", ".join(missing)}.')
+        columns.setdefault('fingerprint', [None] * batch.num_rows)
+        bills: List[Dict] = []
+        for trans_date, descr, value, categ_name, fingerprint in zip(
+                *(columns[column] for column in COLUMNS)):
+            if fingerprint is None:
+                # number identical bills in order, as for a single statement
+                trans = Transaction(trans_date, descr, value)
+                fingerprint = trans._replace(occurrence=occurrences[trans]).fingerprint()
+                occurrences[trans] += 1
+            bills.append({
+                'date': trans_date,
+                'descr': descr,
+                'value': value,
+                'user_name': active_user,
+                'category_id': _get_or_add_categ(categ_name).id,
+                'fingerprint': fingerprint,
+            })
+        imported = get_imported_fingerprints(
+            active_user, [bill['fingerprint'] for bill in bills])
+        new_bills = []
+        for bill in bills:
+            if bill['fingerprint'] in imported or bill['fingerprint'] in added:
+                skip_count += 1
+            else:
+                added.add(bill['fingerprint'])
+                new_bills.append(bill)
+        insert_bills(new_bills)
+        new_bill_count += len(new_bills)
+    session.commit()
+    invalidate(active_user)
+
+    msg = f'{new_bill_count} bills imported successfully.'
+    if skip_count:
+        msg += f' {skip_count} previously imported bills skipped.'
+    return msg
+
+
+def _get_or_add_categ(categ_name: str) -> CategInfo:
+    '''Get one of the active user's categories, adding it if it does not exist.
+
+    New categories are added to the current transaction, but not committed.'''
+    if categ_name not in context.categs:
+        new_category = Category(name=categ_name, user_name=get_active_user_name())
+        session.add(new_category)
+        session.flush()
+        context.cache_categ(categ_name, CategInfo(new_category.id, False))
+    return context.categs[categ_name]
@@ -0,0 +1,95 @@
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Union
+
+from . import config
+
+# fraction of the character height by which text may leave the baseline, and
+# of the character width separating words, when joining characters into lines
+BASELINE_TOLERANCE = 0.5
+WORD_MARGIN = 0.1
+
+
+def extract_tika(url: Union[str, Path]) -> str:
+    '''Extract the text content of a document via the background tika server.'''
+    from . import tika_server  # pylint: disable=import-outside-toplevel
+    return tika_server.extract_text(url)
+
+
+def extract_pdfminer(url: Union[str, Path]) -> str:
+    '''Extract the text content of a pdf in pure python, without the tika server.
+
+    Text is read in content stream order, as by tika, rather than by position,
+    since statements draw a transaction's amount on the baseline of its
+    description but after its reference number, which the statement regexes
+    expect on the line between them.'''
+    try:
+        from pdfminer.converter import PDFPageAggregator
+        from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+        from pdfminer.pdfpage import PDFPage
+    except ImportError as imp_err:
+        raise RuntimeError(
+            'The "pdfminer" extraction engine requires the pdfminer.six package. '
+            'Install it with "pip install pdfminer.six".') from imp_err
+
+    resources = PDFResourceManager()
+    device = PDFPageAggregator(resources, laparams=None)
+    interpreter = PDFPageInterpreter(resources, device)
+    pages = []
+    with open(url, 'rb') as file:
+        for page in PDFPage.get_pages(file):
+            interpreter.process_page(page)
+            pages.append('\n'.join(_stream_lines(_iter_chars(device.get_result()))))
+    device.close()
+    return '\n\n'.join(pages) + '\n'
+
+
+def _iter_chars(layout) -> Iterator:
+    '''Iterate over the characters of a pdfminer layout, in content stream order.'''
+    from pdfminer.layout import LTChar  # pylint: disable=import-outside-toplevel
+    for obj in layout:
+        if isinstance(obj, LTChar):
+            yield obj
+        elif hasattr(obj, '__iter__'):
+            yield from _iter_chars(obj)
+
+
+def _stream_lines(chars: Iterable) -> List[str]:
+    '''Join consecutive characters into lines, starting a new line wherever the
+    text leaves the baseline or moves left, and separating words by their gaps.'''
+    lines: List[str] = []
+    line = ''
+    prev = None
+    for char in chars:
+        if prev is not None:
+            height = min(char.height, prev.height) or 1
+            if abs(char.y0 - prev.y0) > height * BASELINE_TOLERANCE or char.x0 < prev.x0:
+                lines.append(line.strip())
+                line = ''
+            elif (char.x0 - prev.x1 > max(char.width, prev.width) * WORD_MARGIN
+                  and not line.endswith(' ') and char.get_text() != ' '):
+                line += ' '
+        line += char.get_text()
+        prev = char
+    lines.append(line.strip())
+    return [line for line in lines if line]
+
+
+ENGINES: Dict[str, Callable[[Union[str, Path]], str]] = {
+    'tika': extract_tika,
+    'pdfminer': extract_pdfminer,
+}
+
+
+def extract_text(url: Union[str, Path], engine: str = config.EXTRACT_ENGINE) -> str:
+    '''Extract the text content of a statement with the specified engine.'''
+    if engine not in ENGINES:
+        raise ValueError(f'Unknown extraction engine "{engine}". '
+                         f'Valid options: {", ".join(ENGINES)}.')
+    return ENGINES[engine](url)
+
+
+def prepare_engine(engine: str = config.EXTRACT_ENGINE):
+    '''Perform any one-time setup required by the engine before extraction.'''
+    if engine == 'tika':
+        from . import tika_server  # pylint: disable=import-outside-toplevel
+        tika_server.ensure_server()
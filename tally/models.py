@@ -1,21 +1,41 @@
 # pylint:disable=[missing-class-docstring, missing-module-docstring]
 
-from sqlalchemy import (Boolean, Column, Date, Float, ForeignKey, Integer,
-                        MetaData, String, UniqueConstraint, create_engine,
-                        event)
+import re
+from functools import lru_cache
+from typing import Optional
+
+from sqlalchemy import (DDL, Boolean, Column, Date, Float, ForeignKey, Index,
+                        Integer, MetaData, String, UniqueConstraint,
+                        create_engine, event)
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship, sessionmaker
 
 from . import config
 
 
-def _fk_pragma_on_connect(dbapi_con, con_record):  # pylint: disable=unused-argument
-    """Enable foreign key enforcement for SQLite3"""
+@lru_cache(maxsize=64)
+def _compile(pattern: str) -> 're.Pattern':
+    """Compile a (case-insensitive) regular expression, caching recent patterns"""
+    return re.compile(pattern, re.IGNORECASE)
+
+
+def _regexp(pattern: str, value: Optional[str]) -> bool:
+    """Implement SQLite3's REGEXP operator, matching anywhere in the value like rules"""
+    return value is not None and _compile(pattern).search(value) is not None
+
+
+def _sqlite_pragmas_on_connect(dbapi_con, con_record):  # pylint: disable=unused-argument
+    """Enable foreign key enforcement, apply connection settings and add the
+    REGEXP operator for SQLite3"""
     dbapi_con.execute('pragma foreign_keys=ON')
+    for name, value in config.SQLITE_PRAGMAS.items():
+        dbapi_con.execute(f'pragma {name}={value}')
+    dbapi_con.create_function('regexp', 2, _regexp, deterministic=True)
 
 
-engine = create_engine(f'sqlite:///{config.DB_URL}')
-event.listen(engine, 'connect', _fk_pragma_on_connect)
+engine = create_engine(config.DB_URL)
+if engine.dialect.name == 'sqlite':
+    event.listen(engine, 'connect', _sqlite_pragmas_on_connect)
 Session = sessionmaker(engine)
 session = Session()
 convention = {
@@ -32,10 +52,18 @@ Base = declarative_base(bind=engine, metadata=metadata)
 class User(Base):
     __tablename__ = 'users'
     name = Column(String, primary_key=True)
+    # related rows are deleted (and renamed) by the database's foreign key
+    # cascades, rather than loaded into the session to be deleted one by one
     categories = relationship('Category', back_populates='user',
-                              cascade='all, delete-orphan')
+                              cascade='all, delete-orphan', passive_deletes=True,
+                              order_by='Category.name')
     bills = relationship('Bill', back_populates='user',
-                         cascade='all, delete-orphan')
+                         cascade='all, delete-orphan', passive_deletes=True,
+                         order_by='Bill.id')
+    rules = relationship('Rule', back_populates='user',
+                         cascade='all, delete-orphan', passive_deletes=True)
+    statements = relationship('Statement', back_populates='user',
+                              cascade='all, delete-orphan', passive_deletes=True)
 
     def __repr__(self):
         return f'<User(user_name="{self.name}")>'
@@ -51,9 +79,13 @@ class Category(Base):
     hidden = Column(Boolean, default=False)
     user = relationship('User', back_populates='categories')
     bills = relationship('Bill', back_populates='category',
-                         cascade='all, delete-orphan')
-    __table_args__ = (UniqueConstraint(
-        'user_name', 'name', name='user-category-uc'),)
+                         cascade='all, delete-orphan', passive_deletes=True)
+    rules = relationship('Rule', back_populates='category',
+                         cascade='all, delete-orphan', passive_deletes=True)
+    __table_args__ = (
+        UniqueConstraint('user_name', 'name', name='user-category-uc'),
+        Index('ix_categories_user_name_hidden', 'user_name', 'hidden'),
+    )
 
     def __repr__(self):
         return f'<Category(name="{self.name}", user_name="{self.user_name}")>'
@@ -71,8 +103,14 @@ class Bill(Base):
     category_id = Column(
         Integer,
         ForeignKey('categories.id', onupdate='CASCADE', ondelete='CASCADE'))
+    fingerprint = Column(String)
     user = relationship('User', back_populates='bills')
     category = relationship('Category', back_populates='bills')
+    __table_args__ = (
+        Index('ix_bills_user_name_date', 'user_name', 'date'),
+        Index('ix_bills_category_id', 'category_id'),
+        Index('ix_bills_user_name_fingerprint', 'user_name', 'fingerprint'),
+    )
 
     def __repr__(self):
         return (
@@ -81,6 +119,94 @@ class Bill(Base):
             f'category_id={self.category_id})>')
 
 
+class Rule(Base):
+    __tablename__ = 'rules'
+    id = Column(Integer, primary_key=True)
+    pattern = Column(String, nullable=False)
+    is_regex = Column(Boolean, default=False)
+    user_name = Column(
+        String,
+        ForeignKey('users.name', onupdate='CASCADE', ondelete='CASCADE'))
+    category_id = Column(
+        Integer,
+        ForeignKey('categories.id', onupdate='CASCADE', ondelete='CASCADE'))
+    user = relationship('User', back_populates='rules')
+    category = relationship('Category', back_populates='rules')
+    __table_args__ = (UniqueConstraint(
+        'user_name', 'pattern', name='user-rule-uc'),)
+
+    def __repr__(self):
+        return (f'<Rule(pattern="{self.pattern}", is_regex={self.is_regex}, '
+                f'user_name="{self.user_name}", category_id={self.category_id})>')
+
+
+class Statement(Base):
+    __tablename__ = 'statements'
+    id = Column(Integer, primary_key=True)
+    file_hash = Column(String, nullable=False)
+    start_date = Column(Date, nullable=False)
+    end_date = Column(Date, nullable=False)
+    user_name = Column(
+        String,
+        ForeignKey('users.name', onupdate='CASCADE', ondelete='CASCADE'))
+    user = relationship('User', back_populates='statements')
+    __table_args__ = (UniqueConstraint(
+        'user_name', 'file_hash', name='user-statement-uc'),)
+
+    def __repr__(self):
+        return (f'<Statement(file_hash="{self.file_hash}", '
+                f'start_date="{self.start_date}", end_date="{self.end_date}", '
+                f'user_name="{self.user_name}")>')
+
+
+class MonthlyTotal(Base):
+    __tablename__ = 'monthly_totals'
+    user_name = Column(String, primary_key=True)
+    year = Column(Integer, primary_key=True)
+    month = Column(Integer, primary_key=True)
+    category_id = Column(Integer, primary_key=True)
+    total = Column(Float, nullable=False)
+    count = Column(Integer, nullable=False)
+
+    def __repr__(self):
+        return (
+            f'<MonthlyTotal(user_name="{self.user_name}", year={self.year}, '
+            f'month={self.month}, category_id={self.category_id}, '
+            f'total={self.total}, count={self.count})>')
+
+
+# keep monthly_totals in sync with bills in the database, so that every change
+# to bills (including bulk statements and foreign key cascades) is reflected
+_ADD_TO_TOTALS = '''
+    INSERT INTO monthly_totals (user_name, year, month, category_id, total, count)
+    VALUES (NEW.user_name, CAST(substr(NEW.date, 1, 4) AS INTEGER),
+            CAST(substr(NEW.date, 6, 2) AS INTEGER), NEW.category_id, NEW.value, 1)
+    ON CONFLICT (user_name, year, month, category_id)
+    DO UPDATE SET total = total + excluded.total, count = count + 1;'''
+_OLD_TOTAL = '''
+    WHERE user_name = OLD.user_name
+        AND year = CAST(substr(OLD.date, 1, 4) AS INTEGER)
+        AND month = CAST(substr(OLD.date, 6, 2) AS INTEGER)
+        AND category_id = OLD.category_id'''
+_REMOVE_FROM_TOTALS = f'''
+    UPDATE monthly_totals SET total = total - OLD.value, count = count - 1{_OLD_TOTAL};
+    DELETE FROM monthly_totals{_OLD_TOTAL} AND count <= 0;'''
+MONTHLY_TOTALS_TRIGGERS = [
+    f'''CREATE TRIGGER bills_insert_monthly_totals AFTER INSERT ON bills
+    BEGIN{_ADD_TO_TOTALS}
+    END''',
+    f'''CREATE TRIGGER bills_update_monthly_totals
+    AFTER UPDATE OF date, value, user_name, category_id ON bills
+    BEGIN{_REMOVE_FROM_TOTALS}{_ADD_TO_TOTALS}
+    END''',
+    f'''CREATE TRIGGER bills_delete_monthly_totals AFTER DELETE ON bills
+    BEGIN{_REMOVE_FROM_TOTALS}
+    END''',
+]
+for trigger in MONTHLY_TOTALS_TRIGGERS:
+    event.listen(Bill.__table__, 'after_create', DDL(trigger))
+
+
 class ActiveUser(Base):
     __tablename__ = 'active_user'
     name = Column(
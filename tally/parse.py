@@ -1,25 +1,336 @@
+import codecs
+import csv
+import hashlib
+import html
 import re
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from datetime import date, datetime
+from functools import partial
+from itertools import chain
 from pathlib import Path
-from typing import List, Tuple, TypedDict, Union
+from typing import (Callable, Dict, Generator, Iterable, Iterator, List,
+                    NamedTuple, Optional, Tuple, Union)
 
-from tika import parser
+from . import cache, config
+from .extract import extract_text, prepare_engine
+from .profiling import profiler
 
+STATEMENT_SUFFIXES = ('.pdf', '.csv', '.ofx', '.qfx')
 
-class TransDict(TypedDict):
-    '''Provide type hinting support for transaction dict (stage 1)'''
-    Date: List[date]
-    Description: List[str]
-    Value: List[float]
+# version of the parsed transactions stored in the statement cache, to be
+# incremented whenever parsing changes, so that earlier results are not reused
+PARSER_VERSION = 2
 
+# columns of the csv files downloaded from RBC online banking, which cover all of
+# a client's accounts, and the account types read by default
+CSV_DATE, CSV_DESCRS, CSV_VALUE = 'Transaction Date', ('Description 1', 'Description 2'), 'CAD$'
+CSV_ACCOUNT_TYPE, CSV_ACCOUNT_NUMBER = 'Account Type', 'Account Number'
+CSV_CARD_TYPES = ('mastercard', 'visa')
+OFX_TAG = re.compile(r'<(/?)([A-Za-z0-9.]+)>([^<]*)')
 
-def parse_statement(url: Union[str, Path]) -> TransDict:
-    '''Parse all transactions from a banking statment.'''
+# character encoding declared by ofx 2.x (xml) files, or the header of ofx 1.x
+# (sgml) files, e.g. "ENCODING:USASCII" & "CHARSET:1252" (a windows code page)
+OFX_XML_ENCODING = re.compile(r'<\?xml[^>]*encoding=["\']([\w.:-]+)["\']')
+OFX_HEADER_ENCODING = re.compile(r'^ENCODING:\s*(\S+)', re.MULTILINE)
+OFX_HEADER_CHARSET = re.compile(r'^CHARSET:\s*(\S+)', re.MULTILINE)
+
+
+class Transaction(NamedTuple):
+    '''A single transaction parsed from a statement.
+
+    The occurrence distinguishes identical transactions within a statement.'''
+    date: date
+    descr: str
+    value: float
+    occurrence: int = 0
+
+    def fingerprint(self) -> str:
+        '''Hash the transaction, identifying it across repeated imports.'''
+        key = f'{self.date.isoformat()}|{self.descr}|{self.value:.2f}|{self.occurrence}'
+        return hashlib.sha1(key.encode()).hexdigest()
+
+
+# transactions read from a download, returning the statement period if it is given
+DownloadReader = Generator[Transaction, None, Optional[Tuple[date, date]]]
+
+
+class StatementData(NamedTuple):
+    '''The contents of a parsed statement.'''
+    file_hash: str
+    start_date: date
+    end_date: date
+    transactions: List[Transaction]
+
+
+@profiler.stage('parse_statement')
+def read_statement(url: Union[str, Path], engine: str = config.EXTRACT_ENGINE,
+                   use_cache: bool = True, account: Optional[str] = None,
+                   file_hash: Optional[str] = None) -> StatementData:
+    '''Parse the statement period and all transactions from a banking statement.
+
+    csv & ofx downloads may be limited to one account, by its number or last digits.
+    The file hash is computed unless given.'''
     url = Path(url)
-    statement_text = parser.from_file(str(url))['content']
-    start_date, end_date = get_statement_dates(statement_text)
-    trans_dict = get_transactions(statement_text, start_date, end_date)
-    return trans_dict
+    if file_hash is None:
+        file_hash = cache.file_hash(url)
+
+    # csv & ofx downloads are read directly, with the statement period given
+    # by the download, widened to cover its transactions
+    importer = IMPORTERS.get(url.suffix.lower())
+    if importer is not None:
+        with profiler.stage(importer.__name__):
+            transactions, period = _read_download(importer(url, account))
+        if not transactions:
+            raise ValueError(f'No transactions found in "{url}".')
+        dates = [trans.date for trans in transactions] + list(period or ())
+        return StatementData(file_hash, min(dates), max(dates),
+                             number_occurrences(transactions))
+
+    cache_key = _cache_key(file_hash, engine)
+    entry = cache.load(cache_key) if use_cache else None
+    if entry is not None and 'transactions' in entry:
+        start_date, end_date = get_statement_dates(entry['text'])
+        transactions = [Transaction(date.fromisoformat(trans_date), descr, value)
+                        for trans_date, descr, value in entry['transactions']]
+    else:
+        with profiler.stage('extract_text'):
+            statement_text = extract_text(url, engine)
+        start_date, end_date = get_statement_dates(statement_text)
+        with profiler.stage('get_transactions'):
+            transactions = list(get_transactions(statement_text, start_date, end_date))
+        if use_cache:
+            cache.save(cache_key, {
+                'text': statement_text,
+                'transactions': [(trans.date.isoformat(), trans.descr, trans.value)
+                                 for trans in transactions]})
+    return StatementData(file_hash, start_date, end_date,
+                         number_occurrences(transactions))
+
+
+def parse_statement(url: Union[str, Path], engine: str = config.EXTRACT_ENGINE,
+                    use_cache: bool = True) -> List[Transaction]:
+    '''Parse all transactions from a banking statment.'''
+    return read_statement(url, engine, use_cache).transactions
+
+
+@profiler.stage('read_statements')
+def read_statements(urls: Iterable[Union[str, Path]],
+                    max_workers: Optional[int] = None,
+                    engine: str = config.EXTRACT_ENGINE,
+                    use_cache: bool = True,
+                    account: Optional[str] = None,
+                    on_error: Optional[Callable[[Path, Exception], None]] = None,
+                    file_hashes: Optional[Dict[Path, str]] = None
+                    ) -> List[StatementData]:
+    '''Parse multiple banking statements in parallel, in the order given.
+
+    If on_error is given, statements which cannot be read are passed to it with
+    the error and left out, rather than raising the error. Statements are only
+    hashed if not found in file_hashes.'''
+    urls = [Path(url) for url in urls]
+    # stages timed in worker processes would be lost to the profiler
+    if profiler.enabled:
+        max_workers = 1
+    hashes: List[Optional[str]] = [(file_hashes or {}).get(url) for url in urls]
+    read = partial(read_statement if on_error is None else _read_statement_or_error,
+                   engine=engine, use_cache=use_cache, account=account)
+    if len(urls) <= 1 or max_workers == 1:
+        results = [read(url, file_hash=file_hash) for url, file_hash in zip(urls, hashes)]
+    else:
+        # set up the engine once (if any extraction is required), rather than
+        # racing to do so in each worker
+        for ind, url in enumerate(urls):
+            if url.suffix.lower() not in IMPORTERS and hashes[ind] is None:
+                hashes[ind] = cache.file_hash(url)
+        if any(url.suffix.lower() not in IMPORTERS and not (
+                use_cache and cache.exists(_cache_key(str(file_hash), engine)))
+               for url, file_hash in zip(urls, hashes)):
+            prepare_engine(engine)
+        with ProcessPoolExecutor(max_workers) as executor:
+            futures = [executor.submit(read, url, file_hash=file_hash)
+                       for url, file_hash in zip(urls, hashes)]
+            results = [future.result() for future in futures]
+    if on_error is None:
+        return results
+
+    statements = []
+    for url, result in zip(urls, results):
+        if isinstance(result, Exception):
+            on_error(url, result)
+        else:
+            statements.append(result)
+    return statements
+
+
+def _read_statement_or_error(url: Union[str, Path], engine: str, use_cache: bool,
+                             account: Optional[str],
+                             file_hash: Optional[str]) -> Union[StatementData, Exception]:
+    '''Parse a statement, returning rather than raising any error in its contents.'''
+    try:
+        return read_statement(url, engine, use_cache, account, file_hash)
+    except (ValueError, TypeError, csv.Error) as err:
+        return err
+
+
+def parse_statements(urls: Iterable[Union[str, Path]],
+                     max_workers: Optional[int] = None,
+                     engine: str = config.EXTRACT_ENGINE,
+                     use_cache: bool = True) -> Iterator[Transaction]:
+    '''Parse all transactions from multiple banking statements in parallel.
+
+    All statements are parsed before any transactions are returned, so parsing
+    errors are raised before categorization begins.'''
+    statements = read_statements(urls, max_workers, engine, use_cache)
+
+    # stream the transactions from each statement, in the order given
+    return chain.from_iterable(statement.transactions for statement in statements)
+
+
+def _read_download(reader: DownloadReader) -> Tuple[List[Transaction],
+                                                    Optional[Tuple[date, date]]]:
+    '''Read all transactions from a download, along with any statement period.'''
+    transactions = []
+    while True:
+        try:
+            transactions.append(next(reader))
+        except StopIteration as stop:
+            return transactions, stop.value
+
+
+def read_csv(url: Path, account: Optional[str] = None) -> DownloadReader:
+    '''Read the transactions from a csv file downloaded from online banking, one
+    row at a time.
+
+    Only rows of the given account (by number or last digits) are read, else
+    those of credit card accounts. Amounts are negated to match statements,
+    where purchases are positive.'''
+    with open(url, newline='', encoding='utf-8-sig') as file:
+        reader = csv.DictReader(file)
+        missing = [column for column in (CSV_DATE, *CSV_DESCRS, CSV_VALUE)
+                   if column not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f'Missing column(s) in "{url}": {", ".join(missing)}.')
+        for row in reader:
+            if not row[CSV_DATE] or not row[CSV_VALUE]:
+                continue
+            if account is not None:
+                if not (row.get(CSV_ACCOUNT_NUMBER) or '').strip().endswith(account):
+                    continue
+            elif (row.get(CSV_ACCOUNT_TYPE) or '').strip().lower() not in CSV_CARD_TYPES:
+                continue
+            trans_date = datetime.strptime(row[CSV_DATE], '%m/%d/%Y').date()
+            descr = ' '.join(row[column].strip() for column in CSV_DESCRS if row[column])
+            yield Transaction(trans_date, descr, -float(row[CSV_VALUE]))
+
+
+def read_ofx(url: Path, account: Optional[str] = None) -> DownloadReader:
+    '''Read the transactions from an ofx or qfx file (either sgml or xml), one
+    line at a time, returning the statement period (DTSTART to DTEND) if given.
+
+    Only transactions of the given account (by number or last digits) are read,
+    if any. Amounts are negated to match statements, where purchases are positive.'''
+    fields: Optional[Dict[str, str]] = None
+    account_id = ''
+    period: Dict[str, List[date]] = {'DTSTART': [], 'DTEND': []}
+    with open(url, encoding=_ofx_encoding(url), errors='replace') as file:
+        for line in file:
+            for closing, tag, value in OFX_TAG.findall(line):
+                tag = tag.upper()
+                if tag == 'STMTTRN':
+                    if closing and fields is not None and (
+                            account is None or account_id.endswith(account)):
+                        yield _ofx_transaction(fields)
+                    fields = None if closing else {}
+                elif tag == 'ACCTID' and fields is None and not closing:
+                    account_id = value.strip()
+                elif (tag in period and fields is None and not closing and value.strip()
+                      and (account is None or account_id.endswith(account))):
+                    period[tag].append(_ofx_date(value))
+                elif fields is not None and not closing and value.strip():
+                    fields[tag] = html.unescape(value.strip())
+    if period['DTSTART'] and period['DTEND']:
+        return min(period['DTSTART']), max(period['DTEND'])
+    return None
+
+
+def _ofx_encoding(url: Path) -> str:
+    '''Get the character encoding declared by an ofx file, else utf-8.'''
+    with open(url, 'rb') as file:
+        header = file.read(1024).decode('latin-1')
+    xml_encoding = OFX_XML_ENCODING.search(header)
+    if xml_encoding is not None:
+        encoding = xml_encoding.group(1)
+    else:
+        header_encoding = OFX_HEADER_ENCODING.search(header)
+        charset = OFX_HEADER_CHARSET.search(header)
+        if header_encoding is not None and header_encoding.group(1).upper() == 'UTF-8':
+            encoding = 'utf-8'
+        elif charset is not None and charset.group(1).upper() != 'NONE':
+            encoding = charset.group(1)
+            if encoding.isdigit():
+                encoding = f'cp{encoding}'
+        else:
+            encoding = 'utf-8'
+    try:
+        return codecs.lookup(encoding).name
+    except LookupError as lookup_err:
+        raise ValueError(f'Unknown character set "{encoding}" in "{url}".') from lookup_err
+
+
+def _ofx_date(value: str) -> date:
+    '''Convert an ofx date time (YYYYMMDD, with optional time & time zone) to a date.'''
+    return datetime.strptime(value.strip()[:8], '%Y%m%d').date()
+
+
+def _ofx_transaction(fields: Dict[str, str]) -> Transaction:
+    '''Convert the fields of an ofx transaction (STMTTRN) to a transaction.
+
+    The transaction date (DTUSER) is used where given, as on statements, rather
+    than the posting date (DTPOSTED).'''
+    missing = [tag for tag in ('DTPOSTED', 'TRNAMT') if tag not in fields]
+    if missing:
+        raise ValueError(f'Missing field(s) in ofx transaction: {", ".join(missing)}.')
+    trans_date = _ofx_date(fields.get('DTUSER', fields['DTPOSTED']))
+    descr = ' '.join(fields[tag] for tag in ('NAME', 'MEMO') if tag in fields)
+    return Transaction(trans_date, descr, -float(fields['TRNAMT']))
+
+
+# readers of statement files which do not require text extraction, by suffix
+IMPORTERS: Dict[str, Callable[[Path, Optional[str]], DownloadReader]] = {
+    '.csv': read_csv,
+    '.ofx': read_ofx,
+    '.qfx': read_ofx,
+}
+
+
+def number_occurrences(transactions: Iterable[Transaction]) -> List[Transaction]:
+    '''Number repeats of identical transactions, in order of appearance.'''
+    counts: Counter = Counter()
+    numbered = []
+    for trans in transactions:
+        key = trans[:3]
+        numbered.append(trans._replace(occurrence=counts[key]))
+        counts[key] += 1
+    return numbered
+
+
+def _cache_key(file_hash: str, engine: str) -> str:
+    '''Get the cache key for a statement, based on its contents & how it is parsed.'''
+    return f'{file_hash}-{engine}-v{PARSER_VERSION}'
+
+
+def find_statements(paths: Iterable[Union[str, Path]]) -> List[Path]:
+    '''Expand any directories into the statement files they contain.'''
+    statements = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            statements.extend(sorted(
+                child for child in path.iterdir()
+                if child.suffix.lower() in STATEMENT_SUFFIXES))
+        else:
+            statements.append(path)
+    return statements
 
 
 def get_statement_dates(statement_text: str) -> Tuple[date, date]:
@@ -38,34 +349,24 @@ def get_statement_dates(statement_text: str) -> Tuple[date, date]:
     return start_date, end_date
 
 
-def get_transactions(statement_text: str, start_date: date, end_date: date) -> TransDict:
-    '''Parse the transactions from the statement text.'''
+def get_transactions(statement_text: str, start_date: date,
+                     end_date: date) -> Iterator[Transaction]:
+    '''Parse the transactions from the statement text, one at a time.'''
     pattern = re.compile(
         r'(\D{3} \d{2}) \D{3} \d{2} (.+)\n+\d+\n+(-?\$\d+\.\d+)')
-    matches = list(re.finditer(pattern, statement_text))
-    if len(matches) == 0:
-        raise ValueError(
-            'No transactions matched while parsing the statement.')
-
-    # generate lists of transaction dates, descriptions and values
-    trans_date, desc, valu = [], [], []
-    for match in matches:
-        trans_date.append(match.group(1))
-        desc.append(match.group(2))
-        valu.append(float(match.group(3).replace('$', '')))
-
-    # add the year to the transaction date and convert to date object
     start_month = start_date.strftime('%b').upper()
-    date_obj = []
-    for partial_date_str in trans_date:
-        if partial_date_str.split()[0] == start_month:
-            complete_date_str = f'{partial_date_str} {start_date.year}'
+    match = None
+    for match in pattern.finditer(statement_text):
+        # add the year to the transaction date and convert to date object
+        partial_date_str = match.group(1)
+        if partial_date_str[:3] == start_month:
+            year = start_date.year
         else:
-            complete_date_str = f'{partial_date_str} {end_date.year}'
-        date_obj.append(datetime.strptime(
-            complete_date_str, '%b %d %Y').date())
-
-    # combine date, description and value and return as a dict
-    trans_dict: TransDict = {'Date': date_obj,
-                             'Description': desc, 'Value': valu}
-    return trans_dict
+            year = end_date.year
+        trans_date = datetime.strptime(
+            f'{partial_date_str} {year}', '%b %d %Y').date()
+        value = float(match.group(3).replace('$', ''))
+        yield Transaction(trans_date, match.group(2), value)
+    if match is None:
+        raise ValueError(
+            'No transactions matched while parsing the statement.')
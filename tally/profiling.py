@@ -0,0 +1,187 @@
+import cProfile
+import json
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Union
+
+# sqlalchemy is imported when profiling starts, so that instrumented modules can
+# import the profiler without loading the database
+# pylint: disable=import-outside-toplevel
+
+
+class Profiler():
+    '''
+    A class used to time the stages of a command, i.e. text extraction, database
+    writes or summaries, along with the sql statements executed.
+
+    Stages are only timed while the profiler is running, and may be nested (the
+    times of a stage include those of its inner stages). Stages are aggregated
+    by name, over all calls.
+
+    Attributes
+    ----------
+    enabled : bool
+        Whether the profiler is running
+
+    Methods
+    -------
+    start(cprofile_path: Optional[Path])
+        Start profiling, optionally with cProfile.
+    stage(name: str)
+        Context manager (or decorator) timing a stage of the command.
+    report() -> Dict
+        Return the wall & cpu time, peak memory and sql statistics of each stage.
+    stop(report_path: Optional[str])
+        Stop profiling, writing the report as json and any cProfile stats.
+
+    '''
+
+    def __init__(self):
+        self.enabled = False
+        self._stages: Dict[str, Dict] = {}
+        self._open_peaks: List[int] = []
+        self._peak = 0
+        self._sql: Dict[str, Dict] = {}
+        self._sql_count = 0
+        self._sql_time = 0.0
+        self._start_wall = 0.0
+        self._start_cpu = 0.0
+        self._cprofile: Optional[cProfile.Profile] = None
+        self._cprofile_path: Optional[Path] = None
+
+    def start(self, cprofile_path: Optional[Union[str, Path]] = None):
+        '''Start profiling, optionally with cProfile.'''
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+        self.__init__()  # pylint: disable=unnecessary-dunder-call
+        self.enabled = True
+        event.listen(Engine, 'before_cursor_execute', self._before_execute)
+        event.listen(Engine, 'after_cursor_execute', self._after_execute)
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        _reset_peak()
+        if cprofile_path is not None:
+            self._cprofile_path = Path(cprofile_path)
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+        self._start_wall = time.perf_counter()
+        self._start_cpu = time.process_time()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        '''Context manager (or decorator) timing a stage of the command.'''
+        if not self.enabled:
+            yield
+            return
+        self._update_peaks()
+        _reset_peak()
+        self._open_peaks.append(0)
+        start_wall, start_cpu = time.perf_counter(), time.process_time()
+        start_sql_count, start_sql_time = self._sql_count, self._sql_time
+        try:
+            yield
+        finally:
+            self._update_peaks()
+            stats = self._stages.setdefault(name, {
+                'calls': 0, 'wall': 0.0, 'cpu': 0.0, 'peak': 0,
+                'sql_count': 0, 'sql_time': 0.0})
+            stats['calls'] += 1
+            stats['wall'] += time.perf_counter() - start_wall
+            stats['cpu'] += time.process_time() - start_cpu
+            stats['peak'] = max(stats['peak'], self._open_peaks.pop())
+            stats['sql_count'] += self._sql_count - start_sql_count
+            stats['sql_time'] += self._sql_time - start_sql_time
+
+    def report(self) -> Dict:
+        '''Return the wall & cpu time, peak memory and sql statistics of each stage.'''
+        self._update_peaks()
+        statements = sorted(self._sql.items(), key=lambda item: item[1]['time'],
+                            reverse=True)
+        return {
+            'command': ' '.join(['tally', *sys.argv[1:]]),
+            'wall_ms': _ms(time.perf_counter() - self._start_wall),
+            'cpu_ms': _ms(time.process_time() - self._start_cpu),
+            'peak_mb': _mb(self._peak),
+            'stages': {name: {'calls': stats['calls'],
+                              'wall_ms': _ms(stats['wall']),
+                              'cpu_ms': _ms(stats['cpu']),
+                              'peak_mb': _mb(stats['peak']),
+                              'sql_count': stats['sql_count'],
+                              'sql_ms': _ms(stats['sql_time'])}
+                       for name, stats in self._stages.items()},
+            'sql': {'count': self._sql_count,
+                    'ms': _ms(self._sql_time),
+                    'statements': [{'statement': statement,
+                                    'count': stats['count'],
+                                    'ms': _ms(stats['time'])}
+                                   for statement, stats in statements]},
+        }
+
+    def stop(self, report_path: Optional[str] = None):
+        '''Stop profiling, writing the report as json (to stderr for "-") and any
+        cProfile stats.'''
+        if not self.enabled:
+            return
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            self._cprofile.dump_stats(self._cprofile_path)
+        report = self.report()
+        tracemalloc.stop()
+        event.remove(Engine, 'before_cursor_execute', self._before_execute)
+        event.remove(Engine, 'after_cursor_execute', self._after_execute)
+        self.enabled = False
+        if report_path == '-':
+            print(json.dumps(report, indent=2), file=sys.stderr)
+        elif report_path is not None:
+            Path(report_path).write_text(json.dumps(report, indent=2) + '\n')
+
+    def _update_peaks(self):
+        '''Record the peak traced memory since the last reset for all open stages.'''
+        _, peak = tracemalloc.get_traced_memory()
+        self._open_peaks = [max(open_peak, peak) for open_peak in self._open_peaks]
+        self._peak = max(self._peak, peak)
+
+    def _before_execute(self, conn, cursor, statement, parameters, context,
+                        executemany):  # pylint: disable=unused-argument,too-many-arguments
+        '''Record the start of a sql statement.'''
+        conn.info.setdefault('profiler_start', []).append(time.perf_counter())
+
+    def _after_execute(self, conn, cursor, statement, parameters, context,
+                       executemany):  # pylint: disable=unused-argument,too-many-arguments
+        '''Record the count & duration of a sql statement, by statement text.'''
+        elapsed = time.perf_counter() - conn.info['profiler_start'].pop()
+        stats = self._sql.setdefault(' '.join(statement.split()), {'count': 0, 'time': 0.0})
+        stats['count'] += 1
+        stats['time'] += elapsed
+        self._sql_count += 1
+        self._sql_time += elapsed
+
+
+def _reset_peak():
+    '''Reset the peak traced memory to the current traced memory.
+
+    tracemalloc.reset_peak requires python 3.9, so earlier versions clear the
+    traces instead, measuring peaks from zero rather than the current memory.'''
+    if hasattr(tracemalloc, 'reset_peak'):
+        tracemalloc.reset_peak()
+    else:
+        tracemalloc.clear_traces()
+
+
+def _ms(seconds: float) -> float:
+    '''Convert seconds to (rounded) milliseconds.'''
+    return round(seconds * 1000, 3)
+
+
+def _mb(size: int) -> float:
+    '''Convert bytes to (rounded) megabytes.'''
+    return round(size / 2**20, 3)
+
+
+# profiler for the current command, started by the cli's --profile option
+profiler = Profiler()
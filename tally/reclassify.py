@@ -0,0 +1,97 @@
+from typing import Dict, Optional
+
+import pandas as pd
+from sqlalchemy import bindparam
+
+from .context import context
+from .models import Bill, engine, session
+from .profiling import profiler
+from .rules import get_matcher
+from .suggest import invalidate
+from .users import get_active_user_name
+
+CHUNK_SIZE = 50_000
+CHANGE_COLUMNS = ['id', 'old', 'new']
+
+
+@profiler.stage('find_reclassifications')
+def find_reclassifications(chunk_size: int = CHUNK_SIZE) -> pd.DataFrame:
+    '''Find the active user's bills whose category differs from that of the
+    rule matching their description, as (bill id, old & new category id) rows.'''
+    user_name = get_active_user_name()
+    matcher = get_matcher(user_name)
+    if matcher.pattern is None:
+        return pd.DataFrame(columns=CHANGE_COLUMNS)
+    categ_ids = {name: categ.id for name, categ in context.categs.items()}
+    query = session.query(Bill.id, Bill.descr, Bill.category_id).\
+        filter(Bill.user_name == user_name).order_by(Bill.id)
+
+    # descriptions repeat, so the rules are matched once per distinct description
+    # and the result is mapped over each chunk of bills
+    matches: Dict[str, Optional[int]] = {}
+    changes = []
+    for chunk in pd.read_sql(query.statement, engine, chunksize=chunk_size):
+        for descr in chunk['descr'].unique():
+            if descr not in matches:
+                categ_name = matcher.match(descr)
+                matches[descr] = None if categ_name is None else categ_ids[categ_name]
+        new_ids = chunk['descr'].map(matches)
+        changed = new_ids.notna() & (new_ids != chunk['category_id'])
+        changes.append(pd.DataFrame({
+            'id': chunk.loc[changed, 'id'],
+            'old': chunk.loc[changed, 'category_id'],
+            'new': new_ids[changed].astype(int)}))
+    if not changes:
+        return pd.DataFrame(columns=CHANGE_COLUMNS)
+    return pd.concat(changes, ignore_index=True)
+
+
+def summarize_reclassifications(changes: pd.DataFrame) -> str:
+    '''Summarize the number of bills moved between each pair of categories.'''
+    categ_names = {categ.id: name for name, categ in context.categs.items()}
+    counts = changes.groupby(['old', 'new']).size().sort_values(ascending=False)
+    lines = [f'{categ_names[old]} -> {categ_names[new]}: {count} bills'
+             for (old, new), count in counts.items()]
+    title = 'Reclassifications:'
+    return '\n'.join([title, '-'*len(title), *lines])
+
+
+@profiler.stage('apply_reclassifications')
+def apply_reclassifications(changes: pd.DataFrame, chunk_size: int = CHUNK_SIZE):
+    '''Update the category of bills, in batches of a single statement each.
+
+    The updates are added to the current transaction, but not committed.'''
+    update = Bill.__table__.update().\
+        where(Bill.__table__.c.id == bindparam('bill_id')).\
+        values(category_id=bindparam('new_id'))
+    for start in range(0, len(changes), chunk_size):
+        chunk = changes.iloc[start:start + chunk_size]
+        session.execute(update, [
+            {'bill_id': int(bill_id), 'new_id': int(new_id)}
+            for bill_id, new_id in zip(chunk['id'], chunk['new'])])
+
+
+def reclassify(no_confirm: bool, dry_run: bool = False,
+               chunk_size: int = CHUNK_SIZE) -> str:
+    '''Re-apply the active user's rules to all of their bills, moving bills to
+    the category of the rule matching their description.
+
+    Bills which do not match any rule are left unchanged.'''
+    changes = find_reclassifications(chunk_size)
+    if changes.empty:
+        return 'All bills matching a rule are already in its category.'
+    summary = summarize_reclassifications(changes)
+    if dry_run:
+        return f'{summary}\n\n{len(changes)} bills would be reclassified.'
+
+    # confirm the changes prior to proceeding
+    if not no_confirm:
+        confirm = input(f'{summary}\n\nApply changes? ([y]/n)')
+        if not confirm.lower() in ['y', '']:
+            return 'Process aborted during confirmation of changes.'
+        summary = ''
+    apply_reclassifications(changes, chunk_size)
+    session.commit()
+    invalidate(get_active_user_name())
+    msg = f'{len(changes)} bills reclassified successfully.'
+    return f'{summary}\n\n{msg}' if summary else msg
@@ -1,9 +1,10 @@
-from copy import deepcopy
 from datetime import date
+from typing import Optional
 
 import pandas as pd
 
-from .models import Category, engine, session
+from .models import Bill, Category, MonthlyTotal, engine, session
+from .profiling import profiler
 
 # set pandas global display options
 pd.options.display.max_rows = 10_000
@@ -11,6 +12,8 @@ pd.options.display.max_columns = 100
 pd.options.display.width = 250
 pd.options.display.precision = 2
 
+MONTH_NAMES = {month: date(1, month, 1).strftime('%B') for month in range(1, 13)}
+
 
 class TransData():
     '''
@@ -32,36 +35,33 @@ class TransData():
 
     '''
 
-    def __init__(self, user_name: str, show_hidden: bool = False):
-        '''Retrieve all data for the specified user and store as a DataFrame, indexed by date.'''
-        # get bill data for specified user
-        user_data = pd.read_sql('bills', engine, index_col='date', parse_dates='date',
-                                columns=['date', 'descr', 'value', 'user_name', 'category_id'])
-        user_data = user_data.sort_index()
-        user_filt = user_data['user_name'] == user_name
-        user_data = user_data[user_filt]
-
-        # convert category_id to category name
-        user_categs = session.query(Category).\
-            filter_by(user_name=user_name).all()
-        categ_map = {categ.id: categ.name for categ in user_categs}
-        user_data['Category'] = user_data['category_id'].\
-            apply(lambda x: categ_map[x])
-
-        # filter out hidden categories
+    @profiler.stage('TransData.__init__')
+    def __init__(self, user_name: str, show_hidden: bool = False,
+                 start: Optional[date] = None, end: Optional[date] = None,
+                 category: Optional[str] = None):
+        '''Retrieve data for the specified user and store as a DataFrame, indexed by date.
+
+        Data may optionally be limited to a date range (inclusive) and a single category.'''
+        # filter, join category names and sort in the database, so that only
+        # the requested slice of the bills table is loaded
+        query = session.query(
+            Bill.date.label('Date'),
+            Bill.descr.label('Description'),
+            Bill.value.label('Value'),
+            Category.name.label('Category')).\
+            join(Category, Bill.category_id == Category.id).\
+            filter(Bill.user_name == user_name)
         if show_hidden is False:
-            hidden_categs = session.query(Category).\
-                filter_by(hidden=True).all()
-            hidden_categ_names = [categ.name for categ in hidden_categs]
-            hidden_filt = user_data['Category'].isin(hidden_categ_names)
-            user_data = user_data[~hidden_filt]
-
-        # drop unnecessary columns and rename columns
-        user_data.drop(columns=['user_name', 'category_id'], inplace=True)
-        user_data.rename(columns={'descr': 'Description', 'value': 'Value'},
-                         inplace=True)
-        user_data.index.rename('Date', inplace=True)
-        self.data = user_data
+            query = query.filter(Category.hidden.isnot(True))
+        if start is not None:
+            query = query.filter(Bill.date >= start)
+        if end is not None:
+            query = query.filter(Bill.date <= end)
+        if category is not None:
+            query = query.filter(Category.name == category)
+        query = query.order_by(Bill.date, Bill.id)
+        self.data = pd.read_sql(query.statement, engine, index_col='Date',
+                                parse_dates=['Date'])
 
     def filter_first_and_last_month(self):
         '''Filter out data from the first and last month on record, which may be incomplete.'''
@@ -79,23 +79,53 @@ class TransData():
         filt = self.data['Category'] == category
         self.data = self.data[filt]
 
+    @profiler.stage('summarize_all')
     def summarize_all(self) -> pd.DataFrame:
         '''Return a pivot table summary by month and category.'''
-        # create pivot table, sorted by year then month
-        data = deepcopy(self.data)
-        data['Month'] = data.index.to_series().map(
-            lambda row: row.strftime('%B'))
-        data['Year'] = data.index.to_series().map(lambda row: row.year)
-        months = {date(1, month, 1).strftime('%B'): month
-                  for month in range(1, 13)}
-        pivot = pd.pivot_table(data, values='Value', columns='Category',
-                               aggfunc='sum', fill_value=0, index=['Year', 'Month'])
-        pivot.sort_index(level=1, key=lambda rows: sorted(
-            rows, key=lambda row: months[row]), inplace=True)
-        pivot.sort_index(level=0, inplace=True, sort_remaining=False)
-
-        # add category averages and month totals
-        pivot.loc[('Average', ''), :] = pivot.mean(axis=0)
-        pivot = pivot.sort_values(by=pivot.index[-1], axis=1, ascending=False)
-        pivot['total'] = pivot.sum(1)
-        return pivot
+        # sum values by month and category, sorted by year then month
+        months = self.data.index.to_period('M')
+        pivot = self.data['Value'].groupby([months, self.data['Category']]).sum().\
+            unstack(fill_value=0)
+        pivot.index = pd.MultiIndex.from_arrays(
+            [pivot.index.year, pivot.index.month], names=['Year', 'Month'])
+        pivot = pivot.rename(index=MONTH_NAMES, level='Month')
+        return _add_averages_and_totals(pivot)
+
+
+@profiler.stage('summarize_monthly_totals')
+def summarize_monthly_totals(user_name: str, show_hidden: bool = False,
+                             filter_edges: bool = False) -> pd.DataFrame:
+    '''Return a pivot table summary by month and category for the specified user,
+    equivalent to TransData.summarize_all, read from the monthly totals table.'''
+    query = session.query(
+        MonthlyTotal.year.label('Year'),
+        MonthlyTotal.month.label('Month'),
+        Category.name.label('Category'),
+        MonthlyTotal.total.label('Value')).\
+        join(Category, MonthlyTotal.category_id == Category.id).\
+        filter(MonthlyTotal.user_name == user_name)
+    if show_hidden is False:
+        query = query.filter(Category.hidden.isnot(True))
+    totals = pd.read_sql(query.statement, engine)
+
+    # filter out the first and last month on record, which may be incomplete
+    if filter_edges and not totals.empty:
+        periods = totals['Year'] * 12 + totals['Month']
+        if periods.max() - periods.min() < 2:
+            raise ValueError('Error during data filtering. Insufficient data exists '
+                             'to filter out (potentially incomplete) first and last month data.')
+        totals = totals[(periods > periods.min()) & (periods < periods.max())]
+
+    # create pivot table, sorted by year then month
+    pivot = pd.pivot_table(totals, values='Value', columns='Category',
+                           aggfunc='sum', fill_value=0, index=['Year', 'Month'])
+    pivot = pivot.rename(index=MONTH_NAMES, level='Month')
+    return _add_averages_and_totals(pivot)
+
+
+def _add_averages_and_totals(pivot: pd.DataFrame) -> pd.DataFrame:
+    '''Add category averages and month totals to a pivot table summary.'''
+    pivot.loc[('Average', ''), :] = pivot.mean(axis=0)
+    pivot = pivot.sort_values(by=pivot.index[-1], axis=1, ascending=False)
+    pivot['total'] = pivot.sum(1)
+    return pivot
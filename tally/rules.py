@@ -0,0 +1,106 @@
+import re
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import joinedload
+
+from .context import context
+from .models import Category, Rule, session
+from .users import get_active_user_name
+
+# an unescaped backslash followed by a group number, i.e. a numbered backreference
+BACKREFERENCE = re.compile(r'(?<!\\)(?:\\\\)*\\[1-9]')
+
+
+class RuleMatcher():
+    '''
+    Match transaction descriptions against a set of rules in a single pass.
+
+    All rules are compiled into one combined (case-insensitive) regex. The rule
+    matching earliest in the description wins, with ties going to the first rule.
+
+    Methods
+    -------
+    match(descr: str) -> Optional[str]
+        Return the category of the rule matching the description, if any.
+
+    '''
+
+    def __init__(self, rules: Iterable[Tuple[str, bool, str]]):
+        '''Compile rules, given as (pattern, is_regex, category name) tuples.'''
+        self.categories: List[str] = []
+        parts = []
+        for ind, (pattern, is_regex, categ_name) in enumerate(rules):
+            regex = pattern if is_regex else re.escape(pattern)
+            parts.append(f'(?P<_rule{ind}>{regex})')
+            self.categories.append(categ_name)
+        self.pattern = re.compile('|'.join(parts), re.IGNORECASE) if parts else None
+
+    def match(self, descr: str) -> Optional[str]:
+        '''Return the category of the rule matching the description, if any.'''
+        if self.pattern is None:
+            return None
+        match = self.pattern.search(descr)
+        if match is None:
+            return None
+        return self.categories[int(match.lastgroup[len('_rule'):])]
+
+
+def get_matcher(user_name: str) -> RuleMatcher:
+    '''Get a matcher for all of the specified user's rules.'''
+    rules = session.query(Rule.pattern, Rule.is_regex, Category.name).\
+        join(Category).filter(Rule.user_name == user_name).\
+        order_by(Rule.id).all()
+    return RuleMatcher(rules)
+
+
+def get_rules() -> List[Rule]:
+    '''Get all rules for the active user, with their categories loaded.'''
+    return session.query(Rule).options(joinedload(Rule.category)).\
+        filter_by(user_name=get_active_user_name()).order_by(Rule.id).all()
+
+
+def add_rule(pattern: str, categ_name: str, is_regex: bool = False) -> str:
+    '''Add a new rule for the active user, assigning matches to the category.'''
+    if is_regex:
+        error = _check_regex(pattern)
+        if error is not None:
+            return f'Invalid regular expression "{pattern}": {error}.'
+    new_rule = Rule(pattern=pattern, is_regex=is_regex,
+                    user_name=get_active_user_name(),
+                    category_id=context.get_categ(categ_name).id)
+    session.add(new_rule)
+    session.commit()
+    return f'Rule "{pattern}" -> "{categ_name}" added successfully.'
+
+
+def delete_rule(rule_id: int) -> str:
+    '''Delete an existing rule for the active user.'''
+    rule = session.query(Rule).filter_by(
+        id=rule_id, user_name=get_active_user_name()).one()
+    session.delete(rule)
+    session.commit()
+    return f'Rule {rule_id} successfully deleted.'
+
+
+def _check_regex(pattern: str) -> Optional[str]:
+    '''Check a regex rule can be combined with the active user's other rules,
+    returning the reason if not.'''
+    try:
+        compiled = re.compile(pattern)
+    except re.error as re_err:
+        return str(re_err)
+    # each rule is a group of a single combined regex, so rules may not change
+    # the flags or group numbers of the others
+    if compiled.flags & ~re.UNICODE:
+        return 'inline flags are not supported (rules already ignore case)'
+    if compiled.groupindex:
+        return 'named groups are not supported'
+    if BACKREFERENCE.search(pattern):
+        return 'backreferences are not supported'
+    rules = session.query(Rule.pattern, Rule.is_regex, Category.name).\
+        join(Category).filter(Rule.user_name == get_active_user_name()).all()
+    try:
+        RuleMatcher([*rules, (pattern, True, '')])
+    except re.error as re_err:
+        return str(re_err)
+    return None
@@ -0,0 +1,44 @@
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from . import cache
+from .models import Statement, session
+from .parse import StatementData
+
+
+def get_imported_hashes(user_name: str) -> Set[str]:
+    '''Get the file hashes of all statements previously imported by the user.'''
+    rows = session.query(Statement.file_hash).filter_by(user_name=user_name)
+    return {file_hash for file_hash, in rows}
+
+
+def filter_imported(urls: Iterable[Union[str, Path]], user_name: str,
+                    file_hashes: Optional[Dict[Path, str]] = None) -> Tuple[List[Path], int]:
+    '''Drop statements previously imported by the user, or repeated in urls.
+
+    Statements are only hashed if not found in file_hashes. Returns the
+    remaining statements and the number dropped.'''
+    seen = get_imported_hashes(user_name)
+    new_urls, skipped = [], 0
+    for url in map(Path, urls):
+        file_hash = (file_hashes or {}).get(url) or cache.file_hash(url)
+        if file_hash in seen:
+            skipped += 1
+        else:
+            seen.add(file_hash)
+            new_urls.append(url)
+    return new_urls, skipped
+
+
+def record_statements(statements: Iterable[StatementData], user_name: str):
+    '''Record statements as imported by the user.
+
+    The statements are added to the current transaction, but not committed.'''
+    imported = get_imported_hashes(user_name)
+    for statement in statements:
+        if statement.file_hash not in imported:
+            imported.add(statement.file_hash)
+            session.add(Statement(file_hash=statement.file_hash,
+                                  start_date=statement.start_date,
+                                  end_date=statement.end_date,
+                                  user_name=user_name))
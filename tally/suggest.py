@@ -0,0 +1,138 @@
+import hashlib
+import json
+import math
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func
+
+from . import config
+from .models import Bill, Category, session
+
+MODEL_DIR = config.root / 'suggest'
+TOKEN_PATTERN = re.compile(r'[a-z][a-z\']+')
+
+
+def tokenize(descr: str) -> List[str]:
+    '''Split a description into lower case word tokens, ignoring numbers.'''
+    return TOKEN_PATTERN.findall(descr.lower())
+
+
+class Classifier():
+    '''
+    A naive Bayes classifier ranking categories for a transaction description,
+    based on the words of previously categorized descriptions.
+
+    Attributes
+    ----------
+    n_bills : int
+        The number of bills the classifier has been trained on.
+
+    Methods
+    -------
+    update(bills: Iterable[Tuple[str, int]])
+        Train the classifier on (description, category id) pairs.
+    rank(descr: str) -> List[int]
+        Return category ids, from most to least likely for the description.
+
+    '''
+
+    def __init__(self):
+        self.n_bills = 0
+        self.categ_counts: Counter = Counter()
+        self.token_counts: Dict[int, Counter] = {}
+        self.token_totals: Counter = Counter()
+        self.vocab: set = set()
+
+    def update(self, bills: Iterable[Tuple[str, int]]):
+        '''Train the classifier on (description, category id) pairs.'''
+        for descr, categ_id in bills:
+            tokens = tokenize(descr)
+            self.categ_counts[categ_id] += 1
+            self.token_counts.setdefault(categ_id, Counter()).update(tokens)
+            self.token_totals[categ_id] += len(tokens)
+            self.vocab.update(tokens)
+            self.n_bills += 1
+
+    def rank(self, descr: str) -> List[int]:
+        '''Return category ids, from most to least likely for the description.'''
+        tokens = [token for token in tokenize(descr) if token in self.vocab]
+        vocab_size = len(self.vocab)
+        scores = {}
+        for categ_id, categ_count in self.categ_counts.items():
+            token_counts = self.token_counts[categ_id]
+            denom = math.log(self.token_totals[categ_id] + vocab_size)
+            score = math.log(categ_count / self.n_bills)
+            for token in tokens:
+                score += math.log(token_counts[token] + 1) - denom
+            scores[categ_id] = score
+        return sorted(scores, key=lambda categ_id: scores[categ_id], reverse=True)
+
+    def to_json(self) -> Dict:
+        '''Convert the classifier state to a json serializable dict.'''
+        return {'n_bills': self.n_bills,
+                'categ_counts': list(self.categ_counts.items()),
+                'token_counts': [(categ_id, dict(counts))
+                                 for categ_id, counts in self.token_counts.items()]}
+
+    @classmethod
+    def from_json(cls, data: Dict) -> 'Classifier':
+        '''Restore a classifier from its json serializable dict.'''
+        classifier = cls()
+        classifier.n_bills = data['n_bills']
+        classifier.categ_counts = Counter(dict(data['categ_counts']))
+        for categ_id, counts in data['token_counts']:
+            classifier.token_counts[categ_id] = Counter(counts)
+            classifier.token_totals[categ_id] = sum(counts.values())
+            classifier.vocab.update(counts)
+        return classifier
+
+
+def _model_path(user_name: str):
+    '''Get the path of the saved classifier for the specified user.'''
+    user_hash = hashlib.sha1(user_name.encode()).hexdigest()
+    return MODEL_DIR / f'{user_hash}.json'
+
+
+def train(user_name: str) -> Classifier:
+    '''Train a new classifier on the complete bill history of the specified user.'''
+    classifier = Classifier()
+    bills = session.query(Bill.descr, Bill.category_id).\
+        filter_by(user_name=user_name).yield_per(10_000)
+    classifier.update(bills)
+    return classifier
+
+
+def load_classifier(user_name: str) -> Classifier:
+    '''Load the saved classifier for the specified user, retraining it if it
+    is out of sync with the user's bill history.'''
+    classifier: Optional[Classifier] = None
+    try:
+        data = json.loads(_model_path(user_name).read_text())
+        classifier = Classifier.from_json(data)
+    except (OSError, ValueError, KeyError):
+        pass
+
+    bill_count = session.query(func.count(Bill.id)).\
+        filter_by(user_name=user_name).scalar()
+    categ_ids = {categ_id for categ_id, in session.query(Category.id).
+                 filter_by(user_name=user_name)}
+    # a deleted category, with as many bills imported since, leaves the bill count
+    # unchanged, so the classifier's categories are checked as well
+    if (classifier is None or classifier.n_bills != bill_count
+            or not set(classifier.categ_counts) <= categ_ids):
+        classifier = train(user_name)
+        save_classifier(user_name, classifier)
+    return classifier
+
+
+def save_classifier(user_name: str, classifier: Classifier):
+    '''Save the classifier for the specified user.'''
+    MODEL_DIR.mkdir(parents=True, exist_ok=True)
+    _model_path(user_name).write_text(json.dumps(classifier.to_json()))
+
+
+def invalidate(user_name: str):
+    '''Discard the saved classifier for the specified user, forcing a retrain.'''
+    _model_path(user_name).unlink(missing_ok=True)
@@ -0,0 +1,173 @@
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+import requests
+from tika import tika
+
+from . import config
+
+HOST = 'localhost'
+ENDPOINT = f'http://{HOST}:{config.TIKA_PORT}'
+STATE_FILE = config.root / 'tika_server.json'
+HEARTBEAT_FILE = config.root / 'tika_server.heartbeat'
+LOG_FILE = config.root / 'tika_server.log'
+STARTUP_TIMEOUT = 60
+POLL_INTERVAL = 5
+
+# a single http session, so connections to the server are reused for every file
+_http = requests.Session()
+_server_ready = False
+
+
+def is_running() -> bool:
+    '''Check if the tika server is up and responding to requests.'''
+    try:
+        return _http.get(f'{ENDPOINT}/tika', timeout=1).ok
+    except requests.RequestException:
+        return False
+
+
+def start_server(idle_timeout: int = config.TIKA_IDLE_TIMEOUT) -> str:
+    '''Start a background tika server which shuts down after idle_timeout seconds.'''
+    if is_running():
+        return f'Tika server is already running at {ENDPOINT}.'
+    jar_path = _get_jar()
+    _touch_heartbeat()
+    cmd = [sys.executable, '-m', 'tally.tika_server', jar_path, str(idle_timeout)]
+    if os.name == 'nt':
+        detach: Dict = {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP |
+                        subprocess.DETACHED_PROCESS}
+    else:
+        detach = {'start_new_session': True}
+    subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                     stderr=subprocess.DEVNULL, **detach)
+
+    # wait for the server to respond before handing it any work
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while not is_running():
+        if time.monotonic() > deadline:
+            raise RuntimeError(
+                f'Tika server failed to start. See log for details: {LOG_FILE}')
+        time.sleep(0.5)
+    return f'Tika server started at {ENDPOINT}.'
+
+
+def stop_server() -> str:
+    '''Stop the background tika server.'''
+    state = _read_state()
+    if state is None:
+        return 'Tika server is not running.'
+    for pid in [state['pid'], state['java_pid']]:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except OSError:
+            pass
+    STATE_FILE.unlink(missing_ok=True)
+    return 'Tika server stopped.'
+
+
+def server_status() -> str:
+    '''Describe the state of the background tika server.'''
+    state = _read_state()
+    if not is_running():
+        return 'Tika server is not running.'
+    if state is None:
+        return f'Tika server is running at {ENDPOINT} (not managed by tally).'
+    idle = _idle_time()
+    idle_text = 'unknown' if idle is None else f'{int(idle)}s'
+    return (f'Tika server is running at {ENDPOINT} (pid {state["java_pid"]}, '
+            f'idle {idle_text} of {state["idle_timeout"]}s).')
+
+
+def ensure_server():
+    '''Start the tika server if it is not already running.'''
+    global _server_ready  # pylint: disable=global-statement
+    if not _server_ready:
+        if not is_running():
+            start_server()
+        _server_ready = True
+
+
+def extract_text(url: Union[str, Path]) -> str:
+    '''Extract the text content of a document via the tika server.'''
+    ensure_server()
+    _touch_heartbeat()
+    with open(url, 'rb') as file:
+        response = _http.put(f'{ENDPOINT}/tika', data=file, timeout=60,
+                             headers={'Accept': 'text/plain'})
+    response.raise_for_status()
+    response.encoding = 'utf-8'
+    return response.text
+
+
+def _get_jar() -> str:
+    '''Get the path to the tika server jar, downloading it if required.'''
+    jar_path = os.path.join(tika.TikaJarPath, 'tika-server.jar')
+    if not os.path.isfile(jar_path) or \
+            not tika.checkJarSig(tika.TikaServerJar, jar_path):
+        tika.getRemoteJar(tika.TikaServerJar, jar_path)
+    return jar_path
+
+
+def _touch_heartbeat():
+    '''Record server usage, deferring the idle shutdown.'''
+    HEARTBEAT_FILE.touch()
+
+
+def _idle_time() -> Optional[float]:
+    '''Get the time since the server was last used, if recorded.'''
+    try:
+        return time.time() - HEARTBEAT_FILE.stat().st_mtime
+    except FileNotFoundError:
+        return None
+
+
+def _read_state() -> Optional[Dict]:
+    '''Read the process info of the managed server, if any.'''
+    try:
+        return json.loads(STATE_FILE.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def _supervise(jar_path: str, idle_timeout: int):
+    '''Run the tika server until it has been idle for idle_timeout seconds.'''
+    with open(LOG_FILE, 'w') as log_file:
+        java = subprocess.Popen(
+            [tika.TikaJava, '-jar', jar_path, '--port', str(config.TIKA_PORT),
+             '--host', HOST], stdout=log_file, stderr=subprocess.STDOUT)
+    STATE_FILE.write_text(json.dumps(
+        {'pid': os.getpid(), 'java_pid': java.pid, 'idle_timeout': idle_timeout}))
+
+    def _exit(signum, frame):  # pylint: disable=unused-argument
+        raise SystemExit()
+    signal.signal(signal.SIGTERM, _exit)
+
+    try:
+        while java.poll() is None:
+            idle = _idle_time()
+            if idle is None:
+                # restart the idle countdown if the heartbeat was removed
+                _touch_heartbeat()
+            elif idle > idle_timeout:
+                break
+            time.sleep(POLL_INTERVAL)
+    finally:
+        java.terminate()
+        try:
+            java.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            java.kill()
+        state = _read_state()
+        if state is not None and state['pid'] == os.getpid():
+            STATE_FILE.unlink(missing_ok=True)
+
+
+if __name__ == '__main__':
+    _supervise(sys.argv[1], int(sys.argv[2]))
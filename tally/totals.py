@@ -0,0 +1,48 @@
+from typing import Dict, Tuple
+
+from sqlalchemy import Integer, cast, func
+
+from .models import Bill, MonthlyTotal, session
+
+TotalKey = Tuple[str, int, int, int]
+
+
+def _bill_totals_query():
+    '''Query monthly totals by user and category, computed from the bills table.'''
+    year = cast(func.substr(Bill.date, 1, 4), Integer)
+    month = cast(func.substr(Bill.date, 6, 2), Integer)
+    return session.query(
+        Bill.user_name, year, month, Bill.category_id,
+        func.sum(Bill.value), func.count(Bill.id)).\
+        group_by(Bill.user_name, year, month, Bill.category_id)
+
+
+def rebuild_totals() -> str:
+    '''Recompute the monthly totals table from the bills table.'''
+    session.query(MonthlyTotal).delete()
+    columns = [MonthlyTotal.user_name, MonthlyTotal.year, MonthlyTotal.month,
+               MonthlyTotal.category_id, MonthlyTotal.total, MonthlyTotal.count]
+    session.execute(MonthlyTotal.__table__.insert().from_select(
+        [column.name for column in columns], _bill_totals_query().statement))
+    session.commit()
+    count = session.query(func.count()).select_from(MonthlyTotal).scalar()
+    return f'Monthly totals rebuilt successfully ({count} rows).'
+
+
+def check_totals(tolerance: float = 0.005) -> str:
+    '''Compare the monthly totals table against totals computed from the bills table.'''
+    expected: Dict[TotalKey, Tuple[float, int]] = {
+        tuple(row[:4]): (row[4], row[5]) for row in _bill_totals_query()}
+    actual: Dict[TotalKey, Tuple[float, int]] = {
+        (row.user_name, row.year, row.month, row.category_id): (row.total, row.count)
+        for row in session.query(MonthlyTotal)}
+    mismatches = 0
+    for key in expected.keys() | actual.keys():
+        exp_total, exp_count = expected.get(key, (0.0, 0))
+        act_total, act_count = actual.get(key, (0.0, 0))
+        if exp_count != act_count or abs(exp_total - act_total) > tolerance:
+            mismatches += 1
+    if mismatches:
+        return (f'{mismatches} monthly total(s) are inconsistent with bills. '
+                'See command "totals rebuild" to recompute them.')
+    return f'Monthly totals are consistent with bills ({len(expected)} rows).'
@@ -1,5 +1,8 @@
 from typing import List
 
+from sqlalchemy.orm.exc import NoResultFound
+
+from .context import context
 from .models import ActiveUser, User, session
 
 
@@ -19,33 +22,41 @@ def add_user(user_name: str) -> str:
 
 def update_user(old_user_name: str, new_user_name: str) -> str:
     """Modify an existing user's name."""
-    user = session.query(User).filter_by(name=old_user_name).one()
-    user.name = new_user_name
+    # a single update, which the database cascades to all of the user's data
+    updated = session.query(User).filter_by(name=old_user_name).update(
+        {'name': new_user_name}, synchronize_session=False)
+    if not updated:
+        raise NoResultFound(f'No user "{old_user_name}".')
     session.commit()
+    context.reset()
     return f'User "{old_user_name}" successfully updated to "{new_user_name}".'
 
 
 def delete_user(user_name: str) -> str:
     """Delete an existing user."""
-    user = session.query(User).filter_by(name=user_name).one()
-    session.delete(user)
+    # a single delete, which the database cascades to all of the user's data
+    deleted = session.query(User).filter_by(name=user_name).delete(
+        synchronize_session=False)
+    if not deleted:
+        raise NoResultFound(f'No user "{user_name}".')
     session.commit()
+    context.reset()
     return f'User "{user_name}" successfully deleted.'
 
 
 def active_user_exists() -> bool:
     """Check for existance of active user."""
-    return session.query(ActiveUser).count() != 0
+    return context.active_user_exists()
 
 
 def get_active_user() -> User:
     """Get the active user."""
-    return session.query(ActiveUser).one().user
+    return session.query(User).filter_by(name=context.active_user_name).one()
 
 
 def get_active_user_name() -> str:
     """Get name of the active user."""
-    return session.query(ActiveUser).one().name
+    return context.active_user_name
 
 
 def set_active_user(user_name: str) -> str:
@@ -58,4 +69,5 @@ def set_active_user(user_name: str) -> str:
         active_user = ActiveUser(name=user_name)
         session.add(active_user)
     session.commit()
+    context.reset()
     return f'User "{user_name}" successfully set as active user.'
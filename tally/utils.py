@@ -1,18 +1,29 @@
 import functools
 from datetime import date as date_obj
-from typing import Callable
+from itertools import islice
+from typing import (TYPE_CHECKING, Callable, Dict, Iterable, Iterator, List,
+                    Set, TypeVar)
 
-from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm.exc import NoResultFound
+from .profiling import profiler
 
-from .models import Bill, Category, session
-from .users import active_user_exists
+if TYPE_CHECKING:
+    from .models import Bill
+
+T = TypeVar('T')
+
+# database modules are imported by the functions which use them, so that the
+# cli can apply these decorators without loading sqlalchemy or the database
+# pylint: disable=import-outside-toplevel
 
 
 def handle_db_session(func: Callable) -> Callable:
     """Handle database exceptions for the decorated function."""
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
+        from sqlalchemy.exc import IntegrityError
+        from sqlalchemy.orm.exc import NoResultFound
+
+        from .models import session
         result = None
         try:
             result = func(*args, **kwargs)
@@ -24,6 +35,7 @@ def handle_db_session(func: Callable) -> Callable:
                 print('Database error, operation aborted. See error message '
                       f'below for details.\n {int_err.orig.args}')
         except NoResultFound:
+            session.rollback()
             print('No result found which matches input. Please verify spelling.')
         return result
     return wrapper
@@ -33,6 +45,7 @@ def require_active_user(func: Callable) -> Callable:
     """Require active user to be set to execute the decorated function."""
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
+        from .users import active_user_exists
         if active_user_exists():
             result = func(*args, **kwargs)
         else:
@@ -43,10 +56,60 @@ def require_active_user(func: Callable) -> Callable:
     return wrapper
 
 
+def backup_before(func: Callable) -> Callable:
+    """Back up the database (if changed since the last backup) before executing
+    the decorated function, unless it is called with dry_run set."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        from . import backup
+        if not kwargs.get('dry_run'):
+            msg = backup.auto_backup(func.__name__)
+            if msg is not None:
+                print(msg)
+        return func(*args, **kwargs)
+    return wrapper
+
+
 def new_bill(date: date_obj, descr: str, value: float,
-             user_name: str, category_name: str) -> Bill:
+             user_name: str, category_name: str) -> 'Bill':
     """Define a new bill by category_name, rather than category_id"""
+    from .models import Bill, Category, session
+    from .parse import Transaction
     category = session.query(Category).filter_by(
         user_name=user_name, name=category_name).one()
+    fingerprint = Transaction(date, descr, value).fingerprint()
     return Bill(date=date, descr=descr, value=value,  # type:ignore
-                user_name=user_name, category_id=category.id)
+                user_name=user_name, category_id=category.id,
+                fingerprint=fingerprint)
+
+
+@profiler.stage('insert_bills')
+def insert_bills(bills: Iterable[Dict]):
+    """Insert many bills (defined as dicts of column values) in a single statement.
+
+    The insert is added to the current transaction, but not committed."""
+    from .models import Bill, session
+    bills = list(bills)
+    if bills:
+        session.execute(Bill.__table__.insert(), bills)
+
+
+def get_imported_fingerprints(user_name: str, fingerprints: Iterable[str]) -> Set[str]:
+    """Get those of the fingerprints which match an existing bill of the specified user."""
+    from .models import Bill, session
+    imported: Set[str] = set()
+    for chunk in chunked(fingerprints, 500):
+        rows = session.query(Bill.fingerprint).filter(
+            Bill.user_name == user_name, Bill.fingerprint.in_(chunk))
+        imported.update(fingerprint for fingerprint, in rows)
+    return imported
+
+
+def chunked(iterable: Iterable[T], size: int) -> Iterator[List[T]]:
+    """Split an iterable into lists of (at most) the specified size."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
@@ -4,8 +4,10 @@ import os
 from datetime import date
 
 import pytest
-from tally import categ
-from tally.models import ActiveUser, Base, Category, User, session
+from sqlalchemy import event
+from tally import backup, cache, categ, suggest
+from tally.context import context
+from tally.models import ActiveUser, Base, Category, User, engine, session
 from tally.utils import new_bill
 
 
@@ -18,11 +20,20 @@ def check_env():
             '\nAborting tests to preserve production database integrity.')
 
 
+@pytest.fixture(autouse=True)
+def isolate_data_files(tmp_path, monkeypatch):
+    """Use temporary statement cache, classifier & backup files, separate from any real data."""
+    monkeypatch.setattr(backup, 'BACKUP_DIR', tmp_path / 'backups')
+    monkeypatch.setattr(cache, 'CACHE_DIR', tmp_path / 'cache')
+    monkeypatch.setattr(suggest, 'MODEL_DIR', tmp_path / 'suggest')
+
+
 @pytest.fixture
 def clear_test_db():
     """Reset database & session state before/after tests."""
     Base.metadata.drop_all()
     session.close()
+    context.reset()
     Base.metadata.create_all()
     yield session.rollback()
 
@@ -108,10 +119,22 @@ def sample_bill():
 
 @pytest.fixture
 def mock_pick(monkeypatch):
-    def _mock_pick(categories, message):
+    def _mock_pick(categories, message, default_index=0):
         '''Select category1 if 1 appended to description, else category2'''
         if message.rstrip("\"")[-1] == '1':
             return ('category1', 0)
         else:
             return ('category2', 0)
     monkeypatch.setattr(categ, 'pick', _mock_pick)
+
+
+@pytest.fixture
+def sql_statements():
+    """Record the sql statements issued while the fixture is active."""
+    recorded = []
+
+    def _record(conn, cursor, statement, *args):
+        recorded.append(statement)
+    event.listen(engine, 'before_cursor_execute', _record)
+    yield recorded
+    event.remove(engine, 'before_cursor_execute', _record)
@@ -0,0 +1,69 @@
+#pylint:disable=[missing-function-docstring, unused-argument]
+import os
+
+import pytest
+from click.testing import CliRunner
+from tally import backup, users
+from tally.cli import cli
+from tally.models import Bill, User, session
+
+
+def get_backups():
+    return [path.name for path in backup._get_backups()]  # pylint: disable=protected-access
+
+
+@pytest.mark.parametrize('compress,suffix', [(True, '.db.gz'), (False, '.db')])
+def test_create_and_restore(sample_db, compress, suffix):
+    msg = backup.create_backup(compress=compress)
+    backup_name, = get_backups()
+    assert backup_name.endswith(f'-manual{suffix}')
+    assert msg == f'Backup "{backup_name}" created successfully.'
+
+    users.delete_user('scott')
+    assert backup.restore_backup(backup_name) == \
+        f'Backup "{backup_name}" restored successfully.'
+    assert sorted(user.name for user in session.query(User)) == ['sarah', 'scott']
+    assert session.query(Bill).count() == 8
+    # the database is backed up before being replaced
+    assert get_backups()[-1].endswith('-pre-restore.db.gz')
+
+
+def test_restore_missing(sample_db):
+    with pytest.raises(FileNotFoundError):
+        backup.restore_backup('missing.db.gz')
+
+
+def test_prune_backups(sample_db):
+    for _ in range(4):
+        backup.create_backup(keep=3)
+    assert len(get_backups()) == 3
+    assert backup.prune_backups(1) == 2
+    assert len(get_backups()) == 1
+
+
+def test_auto_backup(sample_db):
+    assert backup.auto_backup('delete_user') is not None
+    # skipped while the database is unchanged since the last backup
+    assert backup.auto_backup('delete_user') is None
+    backup_path = backup.BACKUP_DIR / get_backups()[-1]
+    os.utime(backup_path, (0, 0))
+    assert backup.auto_backup('delete_user') is not None
+    assert len(get_backups()) == 2
+
+
+def test_cli_backup(sample_db):
+    runner = CliRunner()
+    result = runner.invoke(cli, 'backup list'.split())
+    assert 'No backups exist yet' in result.output
+
+    result = runner.invoke(cli, 'user delete --yes scott'.split())
+    backup_name, = get_backups()
+    assert backup_name.endswith('-delete_user.db.gz')
+    assert result.output == (f'Backup "{backup_name}" created successfully.\n'
+                             'User "scott" successfully deleted.\n')
+
+    result = runner.invoke(cli, 'backup list'.split())
+    assert backup_name in result.output
+    result = runner.invoke(cli, ['backup', 'restore', '--yes', backup_name])
+    assert result.output == f'Backup "{backup_name}" restored successfully.\n'
+    assert session.query(User).filter_by(name='scott').count() == 1
@@ -0,0 +1,41 @@
+#pylint:disable=[missing-function-docstring, unused-argument]
+import os
+
+from tally import cache
+
+
+def test_file_hash(tmp_path):
+    file1, file2, file3 = (tmp_path / name for name in ['1.pdf', '2.pdf', '3.pdf'])
+    file1.write_bytes(b'statement')
+    file2.write_bytes(b'statement')
+    file3.write_bytes(b'other statement')
+    assert cache.file_hash(file1) == cache.file_hash(file2)
+    assert cache.file_hash(file1) != cache.file_hash(file3)
+
+
+def test_save_and_load():
+    assert cache.load('key') is None
+    assert not cache.exists('key')
+    cache.save('key', {'text': 'sample'})
+    assert cache.exists('key')
+    assert cache.load('key') == {'text': 'sample'}
+
+
+def test_evict_least_recently_used():
+    for ind, key in enumerate(['a', 'b', 'c']):
+        cache.save(key, {'text': 'x' * 100})
+        os.utime(cache.CACHE_DIR / f'{key}.json', (ind, ind))
+    cache.load('a')  # mark as recently used
+    size = (cache.CACHE_DIR / 'a.json').stat().st_size
+    cache.evict(max_size=2 * size)
+    assert cache.load('a') is not None
+    assert cache.load('b') is None
+    assert cache.load('c') is not None
+
+
+def test_info_and_clear():
+    cache.save('a', {'text': 'sample'})
+    cache.save('b', {'text': 'sample'})
+    assert cache.cache_info().startswith('2 cached statement(s)')
+    assert cache.clear_cache() == '2 cached statement(s) removed.'
+    assert cache.cache_info().startswith('0 cached statement(s)')
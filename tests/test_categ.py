@@ -6,9 +6,12 @@ from datetime import date
 import pytest
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm.exc import NoResultFound
-from tally.categ import (TransDict, add_categ, categorize, delete_categ,
-                         get_categs, set_categ_display, update_categ)
-from tally.models import Bill, Category, session
+from tally.categ import (CategSummary, Transaction, add_categ, categorize,
+                         delete_categ, get_categs, list_categs, merge_categs,
+                         recategorize, set_categ_display, update_categ)
+from tally.models import Bill, Category, Rule, session
+from tally.rules import add_rule
+from tally.totals import check_totals
 
 test_input = [
     pytest.param(add_categ, 'new_categ', None, ['groceries', 'gas', 'misc', 'new_categ'],
@@ -47,6 +50,15 @@ def test_get_categs(sample_db):
     assert sorted(test_categs) == sorted(['groceries', 'gas', 'misc'])
 
 
+def test_list_categs(sample_db):
+    set_categ_display('misc', True)
+    assert list_categs() == [
+        CategSummary('gas', False, 0, 0.0),
+        CategSummary('groceries', False, 2, 500.0),
+        CategSummary('misc', True, 2, 500.0),
+    ]
+
+
 test_input = [
     pytest.param(['sample_categ'], False, id='add_categ_default'),
     pytest.param(['sample_categ', True], False, id='add_categ_hidden'),
@@ -75,13 +87,13 @@ def test_hide_categ(empty_db, add_hidden, set_hidden, is_hidden):
 
 
 def test_categorize(empty_db, mock_pick):
-    trans_dict: TransDict = {
-        'Date': [date(2020, 1, 1), date(2020, 1, 2), date(2020, 1, 3), date(2020, 1, 4)],
-        'Value': [100, 200, 300, 400],
-        'Description': ['Sample_description_1', 'Sample_description_2',
-                        'Sample_description_1', 'Sample_description_2']
-    }
-    test_msg = categorize(trans_dict, True)
+    transactions = [
+        Transaction(date(2020, 1, 1), 'Sample_description_1', 100),
+        Transaction(date(2020, 1, 2), 'Sample_description_2', 200),
+        Transaction(date(2020, 1, 3), 'Sample_description_1', 300),
+        Transaction(date(2020, 1, 4), 'Sample_description_2', 400),
+    ]
+    test_msg = categorize(iter(transactions), True)
     assert test_msg == '4 transactions added successfully.'
 
     test_bills = session.query(Bill).all()
@@ -92,3 +104,83 @@ def test_categorize(empty_db, mock_pick):
     assert test_bills[0].user_name == 'scott'
     assert test_bills[0].category.name == 'category1'
     assert test_bills[3].value == 400
+
+
+def test_categorize_skips_imported(empty_db, mock_pick):
+    transactions = [
+        Transaction(date(2020, 1, 1), 'Sample_description_1', 100),
+        Transaction(date(2020, 1, 1), 'Sample_description_1', 100, occurrence=1),
+    ]
+    assert categorize(transactions[:1], True) == '1 transactions added successfully.'
+
+    # overlapping transactions, within the batch or with the database, are skipped
+    test_msg = categorize(transactions + transactions, True)
+    assert test_msg == ('1 transactions added successfully. '
+                        '3 previously imported transactions skipped.')
+    fingerprints = [bill.fingerprint for bill in session.query(Bill).order_by(Bill.id)]
+    assert fingerprints == [trans.fingerprint() for trans in transactions]
+
+
+def _bill_categs(user_name='scott'):
+    return {bill.descr: bill.category.name
+            for bill in session.query(Bill).filter_by(user_name=user_name)}
+
+
+def test_merge_categs(sample_db):
+    add_rule('walmart', 'misc')
+    msg = merge_categs(['misc'], 'groceries')
+    assert msg == '2 bills merged from "misc" into "groceries".'
+    assert get_categs() == ['gas', 'groceries']
+    assert set(_bill_categs().values()) == {'groceries'}
+    assert session.query(Rule).one().category.name == 'groceries'
+    assert _bill_categs('sarah')['canadian tire'] == 'misc'
+    assert check_totals().startswith('Monthly totals are consistent')
+
+
+def test_merge_categs_dry_run(sample_db):
+    msg = merge_categs(['misc', 'gas'], 'groceries', dry_run=True)
+    assert msg == '2 bills would be merged from "misc", "gas" into "groceries".'
+    assert get_categs() == ['gas', 'groceries', 'misc']
+    assert _bill_categs()['walmart'] == 'misc'
+
+
+def test_merge_categs_into_itself(sample_db):
+    msg = merge_categs(['misc', 'groceries'], 'groceries')
+    assert msg == 'Category "groceries" cannot be merged into itself.'
+    assert get_categs() == ['gas', 'groceries', 'misc']
+
+
+def test_merge_categs_non_existing(sample_db):
+    with pytest.raises(NoResultFound):
+        merge_categs(['non_existing'], 'groceries')
+
+
+test_input = [
+    pytest.param('zehrs', {}, {'zehrs'}, id='text'),
+    pytest.param('S', {}, {'zehrs', 'ren\'s', 'sobeys'}, id='ignore_case'),
+    pytest.param('^(zehrs|sobeys)$', {'is_regex': True}, {'zehrs', 'sobeys'}, id='regex'),
+    pytest.param('s', {'from_categ_names': ['misc']}, {'ren\'s'}, id='from_categ'),
+    pytest.param('s', {'start': date(2020, 1, 28)}, {'ren\'s', 'sobeys'}, id='since'),
+    pytest.param('s', {'end': date(2020, 1, 27)}, {'zehrs'}, id='until'),
+    pytest.param('%', {}, set(), id='like_wildcard'),
+]
+
+
+@pytest.mark.parametrize('pattern,kwargs,moved', test_input)
+def test_recategorize(sample_db, pattern, kwargs, moved):
+    msg = recategorize(pattern, 'gas', **kwargs)
+    assert msg == f'{len(moved)} bills recategorized to "gas".'
+    assert {descr for descr, categ in _bill_categs().items() if categ == 'gas'} == moved
+    assert _bill_categs('sarah')['shell'] == 'gas'
+    assert check_totals().startswith('Monthly totals are consistent')
+
+
+def test_recategorize_dry_run(sample_db):
+    msg = recategorize('s', 'gas', dry_run=True)
+    assert msg == '3 bills would be recategorized to "gas".'
+    assert 'gas' not in _bill_categs().values()
+
+
+def test_recategorize_invalid_regex(sample_db):
+    msg = recategorize('(', 'gas', is_regex=True)
+    assert msg.startswith('Invalid regular expression "("')
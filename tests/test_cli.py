@@ -1,10 +1,13 @@
 #pylint:disable=[missing-function-docstring, unused-argument]
+import json
+import subprocess
+import sys
 from datetime import date
-from typing import Dict
+from pathlib import Path
 
 import pytest
 from click.testing import CliRunner
-from tally import categ, parse, users
+from tally import cache, categ, parse, users
 from tally.cli import cli
 from tally.models import ActiveUser, Bill, Category, User, session
 from tally.review import TransData
@@ -102,9 +105,22 @@ misc
 '''.lstrip('\n')
 )
 
+MSG_CATEG_DETAILS = (
+    '''
+List of Categories:
+-------------------
+gas: 0 bills, 0.00 total
+groceries: 2 bills, 500.00 total
+misc: 2 bills, 500.00 total
+
+'''.lstrip('\n')
+)
+
 test_input = [
     pytest.param('categ list'.split(), ['groceries', 'gas', 'misc'],
                  MSG_CATEG_NO_OPTIONS, id='list'),
+    pytest.param('categ list -d'.split(), ['groceries', 'gas', 'misc'],
+                 MSG_CATEG_DETAILS, id='list details'),
     pytest.param('categ add new'.split(), ['groceries', 'gas', 'misc', 'new'],
                  None, id='add valid'),
     pytest.param('categ add groceries'.split(), ['groceries', 'gas', 'misc'],
@@ -177,15 +193,13 @@ def test_categ_display(empty_db, cli_input, add_hidden, is_hidden):
 
 
 def test_parse(empty_db, monkeypatch, mock_pick):
-    # mock the tika parser
+    # mock the tika server
     statement_text = sample1['statement_text']
 
-    class MockTika:
-        '''Mock Tika.parser response'''
-        @staticmethod
-        def from_file(url: str) -> Dict[str, str]:
-            return {'content': statement_text}
-    monkeypatch.setattr(parse, 'parser', MockTika)
+    def mock_extract_text(url: Path, engine: str) -> str:
+        '''Mock tika server response'''
+        return statement_text
+    monkeypatch.setattr(parse, 'extract_text', mock_extract_text)
 
     # run parse on sample input with user categorization (pick) mocked
     runner = CliRunner()
@@ -203,6 +217,68 @@ def test_parse(empty_db, monkeypatch, mock_pick):
     assert test_bills[6].value == 43.79
 
 
+def test_parse_repeated(empty_db, monkeypatch, mock_pick):
+    monkeypatch.setattr(parse, 'extract_text', lambda url, engine: sample1['statement_text'])
+    runner = CliRunner()
+    runner.invoke(cli, f'parse --no_confirm {sample1["url"]}'.split())
+
+    # previously imported statements are skipped before parsing
+    monkeypatch.setattr(parse, 'extract_text', None)
+    result = runner.invoke(cli, f'parse --no_confirm {sample1["url"]}'.split())
+    assert result.output == '1 previously imported statement(s) skipped.\n'
+
+    # and previously imported transactions are skipped when re-imported
+    monkeypatch.setattr(parse, 'extract_text', lambda url, engine: sample1['statement_text'])
+    result = runner.invoke(
+        cli, f'parse --no_confirm --reimport --no_cache {sample1["url"]}'.split())
+    assert result.output == ('0 transactions added successfully. '
+                             '7 previously imported transactions skipped.\n')
+    assert session.query(Bill).count() == 7
+
+
+def test_parse_download(empty_db, monkeypatch, mock_pick):
+    # transactions from a csv download match those of the pdf statement, so
+    # are skipped when the statement is parsed after the download
+    runner = CliRunner()
+    result = runner.invoke(cli, 'parse --no_confirm tests/data/sample_statement1.csv'.split())
+    assert result.output == '7 transactions added successfully.\n'
+    monkeypatch.setattr(parse, 'extract_text', lambda url, engine: sample1['statement_text'])
+    result = runner.invoke(cli, f'parse --no_confirm --no_cache {sample1["url"]}'.split())
+    assert result.output == ('0 transactions added successfully. '
+                             '7 previously imported transactions skipped.\n')
+
+
+def test_parse_hashes_once(empty_db, monkeypatch, mock_pick):
+    monkeypatch.setattr(parse, 'extract_text', lambda url, engine: sample1['statement_text'])
+    hashed = []
+    file_hash = cache.file_hash
+    monkeypatch.setattr(cache, 'file_hash', lambda url: hashed.append(url) or file_hash(url))
+    runner = CliRunner()
+    result = runner.invoke(cli, ['parse', '--no_confirm', '-j', '1', sample1['url'],
+                                 'tests/data/sample_statement1.ofx'])
+    assert result.exit_code == 0
+    assert len(hashed) == 2
+
+
+def test_parse_skips_unreadable(empty_db, mock_pick, tmp_path):
+    (tmp_path / 'bad.csv').write_text('Date,Amount\n2019-03-22,-44.71\n')
+    (tmp_path / 'empty.ofx').write_text('<OFX></OFX>')
+    runner = CliRunner()
+    result = runner.invoke(cli, ['parse', '--no_confirm', str(tmp_path)])
+    assert result.exit_code == 0
+    assert result.output == (
+        f'Skipped {tmp_path / "bad.csv"}: Missing column(s) in "{tmp_path / "bad.csv"}": '
+        'Transaction Date, Description 1, Description 2, CAD$.\n'
+        f'Skipped {tmp_path / "empty.ofx"}: No transactions found in '
+        f'"{tmp_path / "empty.ofx"}".\n')
+
+    # readable statements are still imported
+    result = runner.invoke(cli, ['parse', '--no_confirm', '-j', '2', str(tmp_path),
+                                 'tests/data/sample_statement1.csv'])
+    assert result.output.endswith('7 transactions added successfully.\n')
+    assert session.query(Bill).count() == 7
+
+
 def test_review(review_db):
     runner = CliRunner()
     result = runner.invoke(cli, 'review')
@@ -233,3 +309,118 @@ def test_review_filter_by_category(review_db):
     sample_df = TransData('scott')
     sample_df.filter_by_category('groceries')
     assert str(sample_df.data) in result.output
+
+
+MSG_RULE_LIST = (
+    '''
+List of Rules:
+--------------
+1: "zehrs" -> groceries
+2: "wal.?mart" (regex) -> misc
+
+'''.lstrip('\n')
+)
+
+
+def test_rule_operations(sample_db):
+    runner = CliRunner()
+    runner.invoke(cli, 'rule add zehrs groceries'.split())
+    runner.invoke(cli, 'rule add -r wal.?mart misc'.split())
+    result = runner.invoke(cli, 'rule list'.split())
+    assert result.output == MSG_RULE_LIST
+    result = runner.invoke(cli, 'rule delete 1 2'.split())
+    assert result.output == ('Rule 1 successfully deleted.\n'
+                             'Rule 2 successfully deleted.\n')
+    result = runner.invoke(cli, 'rule list'.split())
+    assert 'No rules exist yet' in result.output
+
+
+def test_review_date_range(review_db):
+    runner = CliRunner()
+    result = runner.invoke(cli, 'review --since 2020-01-01 --until 2020-01-31')
+    sample_df = TransData('scott', start=date(2020, 1, 1),
+                          end=date(2020, 1, 31)).summarize_all()
+    assert str(sample_df) in result.output
+    assert 'December' not in result.output
+
+
+def test_totals(sample_db):
+    runner = CliRunner()
+    result = runner.invoke(cli, 'totals rebuild'.split())
+    assert result.output == 'Monthly totals rebuilt successfully (5 rows).\n'
+    result = runner.invoke(cli, 'totals check'.split())
+    assert result.output == 'Monthly totals are consistent with bills (5 rows).\n'
+
+
+def test_merge_and_recat(sample_db):
+    runner = CliRunner()
+    result = runner.invoke(cli, 'categ merge misc groceries --dry_run'.split())
+    assert result.output == '2 bills would be merged from "misc" into "groceries".\n'
+    result = runner.invoke(cli, 'categ merge misc groceries'.split())
+    assert result.output.endswith('2 bills merged from "misc" into "groceries".\n')
+    result = runner.invoke(cli, ['recat', '--match', 'S', '--to', 'gas',
+                                 '--from', 'groceries', '--since', '2020-01-27'])
+    assert result.output.endswith('2 bills recategorized to "gas".\n')
+    assert categ.get_categs() == ['gas', 'groceries']
+
+
+def test_reclassify(sample_db):
+    runner = CliRunner()
+    runner.invoke(cli, 'rule add walmart groceries'.split())
+    result = runner.invoke(cli, 'reclassify --dry_run'.split())
+    assert result.output.endswith('1 bills would be reclassified.\n')
+    result = runner.invoke(cli, 'reclassify --no_confirm'.split())
+    assert result.output.endswith('1 bills reclassified successfully.\n')
+
+
+def test_profile(sample_db, tmp_path):
+    report_path = tmp_path / 'report.json'
+    runner = CliRunner()
+    result = runner.invoke(cli, ['--profile', str(report_path), 'review'])
+    assert result.exit_code == 0
+    report = json.loads(report_path.read_text())
+    assert 'summarize_monthly_totals' in report['stages']
+    assert report['sql']['count'] > 0
+
+
+test_input = [
+    pytest.param('--help', ['sqlalchemy', 'pandas', 'tika'], id='help'),
+    pytest.param('user list', ['pandas', 'tika'], id='user list'),
+    pytest.param('categ list', ['pandas', 'tika'], id='categ list'),
+]
+
+
+@pytest.mark.parametrize('cli_input,unused_modules', test_input)
+def test_lazy_imports(sample_db, cli_input, unused_modules):
+    # run in a fresh interpreter, listing every module imported
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'from tally.cli import cli; cli()',
+         *cli_input.split()], capture_output=True, text=True, check=True)
+    imported = {line.split('|')[-1].strip().split('.')[0]
+                for line in result.stderr.splitlines() if line.startswith('import time:')}
+    assert 'tally' in imported
+    assert imported.isdisjoint(unused_modules)
+
+
+def test_export_import(sample_db, tmp_path):
+    pytest.importorskip('pyarrow')
+    url = tmp_path / 'bills.parquet'
+    runner = CliRunner()
+    result = runner.invoke(cli, ['export', str(url)])
+    assert result.output == f'4 bills exported successfully to "{url}".\n'
+    result = runner.invoke(cli, ['import', str(url)])
+    assert result.output == ('0 bills imported successfully. '
+                             '4 previously imported bills skipped.\n')
+
+
+def test_export_import_errors(sample_db, tmp_path):
+    runner = CliRunner()
+    result = runner.invoke(cli, ['export', str(tmp_path / 'bills.csv')])
+    assert result.exit_code == 0
+    assert result.output.startswith('Unknown file type ".csv". Valid options:')
+    url = tmp_path / 'bills.txt'
+    url.write_text('')
+    result = runner.invoke(cli, ['import', str(url)])
+    assert result.exit_code == 0
+    assert result.output.startswith('Unknown file type ".txt". Valid options:')
+    assert result.output.endswith('No bills imported.\n')
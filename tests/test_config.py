@@ -0,0 +1,122 @@
+#pylint:disable=[missing-function-docstring, unused-argument]
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+from tally import config
+from tally.models import session
+
+
+def load_config(tmp_path, config_text=None, **env):
+    '''Load tally.config in a fresh interpreter, with the given settings.'''
+    if config_text is not None:
+        (tmp_path / 'config.ini').write_text(config_text)
+    environ = {key: value for key, value in os.environ.items()
+               if not key.startswith('TALLY_')}
+    environ.update({'TALLY_HOME': str(tmp_path), **env})
+    script = ('import json; from tally import config; print(json.dumps('
+              '[str(config.DB_PATH), config.DB_URL, config.SQLITE_PRAGMAS]))')
+    result = subprocess.run([sys.executable, '-c', script], env=environ,
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout)
+
+
+def test_default(tmp_path):
+    db_path, db_url, pragmas = load_config(tmp_path)
+    assert db_path == str(tmp_path / 'tally.db')
+    assert db_url == f'sqlite:///{tmp_path / "tally.db"}'
+    assert pragmas['journal_mode'] == 'WAL'
+
+
+test_input = [
+    pytest.param('[tally]\ndb_path = {tmp}/other.db\n', {}, '{tmp}/other.db',
+                 'sqlite:///{tmp}/other.db', id='config file path'),
+    pytest.param('[tally]\ndb_path = {tmp}/other.db\n',
+                 {'TALLY_DB_PATH': '{tmp}/env.db'}, '{tmp}/env.db',
+                 'sqlite:///{tmp}/env.db', id='environment overrides file'),
+    pytest.param(None, {'TALLY_DB_URL': 'sqlite:///{tmp}/url.db'}, '{tmp}/url.db',
+                 'sqlite:///{tmp}/url.db', id='sqlite url'),
+    pytest.param(None, {'TALLY_DB_URL': 'sqlite+pysqlite:///{tmp}/url.db'},
+                 '{tmp}/url.db', 'sqlite+pysqlite:///{tmp}/url.db', id='sqlite driver url'),
+    pytest.param(None, {'TALLY_DB_URL': 'sqlite://'}, 'None', 'sqlite://',
+                 id='in memory url'),
+    pytest.param(None, {'TALLY_DB_URL': 'sqlite:///:memory:'}, 'None',
+                 'sqlite:///:memory:', id='named in memory url'),
+]
+
+
+@pytest.mark.parametrize('config_text,env,db_path,db_url', test_input)
+def test_db_location(tmp_path, config_text, env, db_path, db_url):
+    def fill(text):
+        return text.format(tmp=tmp_path)
+    settings = load_config(
+        tmp_path, config_text and fill(config_text),
+        **{key: fill(value) for key, value in env.items()})
+    assert settings[:2] == [fill(db_path), fill(db_url)]
+
+
+def test_db_url_not_sqlite(tmp_path):
+    with pytest.raises(subprocess.CalledProcessError) as err:
+        load_config(tmp_path, TALLY_DB_URL='postgresql://localhost/tally')
+    assert 'Unsupported database url "postgresql://localhost/tally"' in err.value.stderr
+
+
+def test_in_memory_db(tmp_path):
+    environ = {key: value for key, value in os.environ.items()
+               if not key.startswith('TALLY_')}
+    environ.update({'TALLY_HOME': str(tmp_path), 'TALLY_DB_URL': 'sqlite://'})
+    result = subprocess.run([sys.executable, '-c', 'from tally.cli import cli; cli()',
+                             'user', 'list'],
+                            env=environ, capture_output=True, text=True, check=True)
+    assert result.stdout.startswith('No users exist yet.')
+
+
+def load_settings(tmp_path, config_text=None, **env):
+    '''Load the non database settings of tally.config in a fresh interpreter.'''
+    if config_text is not None:
+        (tmp_path / 'config.ini').write_text(config_text)
+    environ = {key: value for key, value in os.environ.items()
+               if not key.startswith('TALLY_')}
+    environ.update({'TALLY_HOME': str(tmp_path), **env})
+    script = ('import json; from tally import config; print(json.dumps('
+              '[config.EXTRACT_ENGINE, config.CACHE_MAX_SIZE, config.TIKA_PORT, '
+              'config.TIKA_IDLE_TIMEOUT, config.BACKUP_KEEP]))')
+    result = subprocess.run([sys.executable, '-c', script], env=environ,
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout)
+
+
+test_input = [
+    pytest.param(None, {}, ['tika', 50 * 2**20, 9998, 1800, 10], id='defaults'),
+    pytest.param('[tally]\nextract_engine = pdfminer\ncache_max_size = 1024\n'
+                 'tika_port = 9000\ntika_idle_timeout = 60\nbackup_keep = 3\n', {},
+                 ['pdfminer', 1024, 9000, 60, 3], id='config file'),
+    pytest.param('[tally]\nbackup_keep = 3\n', {'TALLY_BACKUP_KEEP': '5'},
+                 ['tika', 50 * 2**20, 9998, 1800, 5], id='environment overrides file'),
+]
+
+
+@pytest.mark.parametrize('config_text,env,settings', test_input)
+def test_settings(tmp_path, config_text, env, settings):
+    assert load_settings(tmp_path, config_text, **env) == settings
+
+
+def test_invalid_int_setting(tmp_path):
+    with pytest.raises(subprocess.CalledProcessError) as err:
+        load_settings(tmp_path, '[tally]\nbackup_keep = many\n')
+    assert 'Invalid setting backup_keep = "many"' in err.value.stderr
+
+
+def test_sqlite_pragmas_file(tmp_path):
+    _, _, pragmas = load_config(tmp_path, '[sqlite]\nsynchronous = FULL\n')
+    assert pragmas['synchronous'] == 'FULL'
+    assert pragmas['journal_mode'] == 'WAL'
+
+
+def test_sqlite_pragmas_applied(sample_db):
+    for name, value in [('journal_mode', 'wal'), ('foreign_keys', 1),
+                        ('synchronous', 1), ('temp_store', 2)]:
+        assert session.execute(f'pragma {name}').scalar() == value
+    assert config.DB_URL.endswith('test.db')
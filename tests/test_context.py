@@ -0,0 +1,70 @@
+#pylint:disable=[missing-function-docstring, redefined-outer-name, unused-argument]
+import pytest
+from click.testing import CliRunner
+from sqlalchemy.orm.exc import NoResultFound
+from tally import categ, users
+from tally.cli import cli
+from tally.context import CategInfo, context
+from tally.models import Category, session
+
+
+def count_selects(statements):
+    return sum(statement.lstrip().upper().startswith('SELECT') for statement in statements)
+
+
+def test_lookups_cached(sample_db, sql_statements):
+    assert context.active_user_name == 'scott'
+    assert context.get_categ('gas').hidden is False
+    assert categ.get_categs() == ['gas', 'groceries', 'misc']
+    assert users.get_active_user_name() == 'scott'
+    assert categ.is_hidden('misc') is False
+    assert count_selects(sql_statements) == 2
+
+
+def test_missing_categ(sample_db):
+    with pytest.raises(NoResultFound):
+        context.get_categ('missing')
+
+
+def test_writes_update_context(sample_db):
+    categ.add_categ('coffee', hidden=True)
+    categ.set_categ_display('gas', True)
+    categ.update_categ('misc', 'other')
+    categ.delete_categ('groceries')
+    expected = {name: CategInfo(categ_id, bool(hidden)) for name, categ_id, hidden in
+                session.query(Category.name, Category.id, Category.hidden).
+                filter_by(user_name='scott')}
+    assert context.categs == expected
+    assert sorted(expected) == ['coffee', 'gas', 'other']
+
+    users.set_active_user('sarah')
+    assert categ.get_categs() == ['gas', 'groceries', 'misc']
+
+
+@pytest.mark.parametrize('command', ['add', 'hide', 'show'])
+def test_cli_queries_constant(sample_db, sql_statements, command):
+    # lookups do not scale with the number of categories in a command
+    runner = CliRunner()
+    counts = []
+    for categ_names in [['c1'], ['c2', 'c3', 'c4', 'c5']]:
+        if command != 'add':
+            for categ_name in categ_names:
+                categ.add_categ(categ_name)
+        sql_statements.clear()
+        result = runner.invoke(cli, ['categ', command, *categ_names])
+        assert result.exit_code == 0
+        counts.append(count_selects(sql_statements))
+    assert counts[0] == counts[1]
+
+
+def test_categ_list_queries_constant(sample_db, sql_statements):
+    runner = CliRunner()
+    counts = []
+    for categ_names in [[], [f'new{ind}' for ind in range(20)]]:
+        for categ_name in categ_names:
+            categ.add_categ(categ_name)
+        sql_statements.clear()
+        result = runner.invoke(cli, 'categ list -d'.split())
+        assert result.exit_code == 0
+        counts.append(count_selects(sql_statements))
+    assert counts[0] == counts[1]
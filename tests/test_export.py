@@ -0,0 +1,68 @@
+#pylint:disable=[missing-function-docstring, unused-argument]
+from datetime import date
+
+import pandas as pd
+import pytest
+from tally import categ, users
+from tally.export import export_bills, import_bills
+from tally.models import Bill, Category, session
+
+pytest.importorskip('pyarrow')
+
+
+def get_bills(user_name):
+    return [(bill.date, bill.descr, bill.value, bill.category.name)
+            for bill in session.query(Bill).filter_by(user_name=user_name).
+            order_by(Bill.date, Bill.id)]
+
+
+@pytest.mark.parametrize('file_name', ['bills.parquet', 'bills.arrow'])
+def test_round_trip(sample_db, tmp_path, file_name):
+    url = tmp_path / file_name
+    expected = get_bills('scott')
+    assert export_bills(url, chunk_size=3) == \
+        f'4 bills exported successfully to "{url}".'
+
+    # dtypes are preserved for downstream tools
+    data = pd.read_parquet(url) if url.suffix == '.parquet' else pd.read_feather(url)
+    assert data.columns.to_list() == ['date', 'descr', 'value', 'category', 'fingerprint']
+    assert data['date'].to_list() == [bill[0] for bill in expected]
+    assert data['value'].dtype == 'float64'
+
+    # import into another user, creating missing categories
+    users.set_active_user('sarah')
+    categ.delete_categ('groceries')
+    assert import_bills(url, chunk_size=3) == '4 bills imported successfully.'
+    imported = [bill for bill in get_bills('sarah') if bill[1] in
+                {descr for _, descr, _, _ in expected}]
+    assert imported == expected
+    assert session.query(Category).filter_by(
+        user_name='sarah', name='groceries').count() == 1
+
+    # importing again skips the previously imported bills
+    assert import_bills(url) == \
+        '0 bills imported successfully. 4 previously imported bills skipped.'
+
+
+def test_import_without_fingerprints(empty_db, tmp_path):
+    url = tmp_path / 'bills.parquet'
+    pd.DataFrame({
+        'date': [date(2020, 1, 1)] * 3,
+        'descr': ['ZEHRS'] * 3,
+        'value': [10.0, 10.0, 20.0],
+        'category': ['category1'] * 3,
+    }).to_parquet(url)
+    assert import_bills(url) == '3 bills imported successfully.'
+    assert import_bills(url) == \
+        '0 bills imported successfully. 3 previously imported bills skipped.'
+
+
+test_input = [
+    pytest.param('bills.csv', ValueError, id='unknown suffix'),
+]
+
+
+@pytest.mark.parametrize('file_name,error', test_input)
+def test_export_invalid(sample_db, tmp_path, file_name, error):
+    with pytest.raises(error):
+        export_bills(tmp_path / file_name)
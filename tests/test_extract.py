@@ -0,0 +1,99 @@
+#pylint:disable=[missing-function-docstring, unused-argument]
+import re
+
+import pytest
+from tally.extract import extract_text
+from tally.parse import get_statement_dates, get_transactions
+
+from .test_parse import sample1, sample2
+
+
+def make_pdf(statement_text: str) -> bytes:
+    '''Render statement text as a minimal pdf, laid out as an RBC statement.
+
+    Transaction rows are drawn in columns, with the reference number below the
+    description and the amount on the description's baseline at the right edge,
+    drawn after the reference as in the content stream of real statements.'''
+    row = re.compile(r'^(\D{3} \d{2}) (\D{3} \d{2}) (.+)$')
+    reference = re.compile(r'^\d+$')
+    amount = re.compile(r'^-?\$\d+\.\d+$')
+    lines = [line for line in statement_text.splitlines() if line.strip()]
+
+    # group transaction rows with their reference & amount lines
+    items = []
+    while lines:
+        if (row.match(lines[0]) and len(lines) >= 3 and reference.match(lines[1])
+                and amount.match(lines[2])):
+            items.append(lines[:3])
+            lines = lines[3:]
+        else:
+            items.append(lines[:1])
+            lines = lines[1:]
+    pages = [items[ind:ind + 40] for ind in range(0, len(items), 40)]
+
+    def text_obj(x_pos: int, y_pos: int, text: str) -> str:
+        text = text.encode('latin-1', 'replace').decode('latin-1')
+        text = text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+        return f'BT /F1 10 Tf {x_pos} {y_pos} Td ({text}) Tj ET\n'
+
+    objects = ['<< /Type /Catalog /Pages 2 0 R >>', '',
+               '<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica '
+               '/Encoding /WinAnsiEncoding >>']
+    page_ids = []
+    for page in pages:
+        stream = ''
+        for ind, item in enumerate(page):
+            y_pos = 760 - ind * 18
+            if len(item) == 3:
+                for x_pos, part in zip([40, 90, 140], row.match(item[0]).groups()):
+                    stream += text_obj(x_pos, y_pos, part)
+                stream += text_obj(140, y_pos - 9, item[1])
+                stream += text_obj(520, y_pos, item[2])
+            else:
+                stream += text_obj(40, y_pos, item[0])
+        objects.append(f'<< /Length {len(stream.encode("latin-1"))} >>\n'
+                       f'stream\n{stream}endstream')
+        objects.append('<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] '
+                       f'/Contents {len(objects)} 0 R '
+                       '/Resources << /Font << /F1 3 0 R >> >> >>')
+        page_ids.append(len(objects))
+    kids = ' '.join(f'{page_id} 0 R' for page_id in page_ids)
+    objects[1] = f'<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>'
+
+    pdf = b'%PDF-1.4\n'
+    offsets = []
+    for num, obj in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += f'{num} 0 obj\n{obj}\nendobj\n'.encode('latin-1')
+    xref = len(pdf)
+    pdf += f'xref\n0 {len(objects) + 1}\n0000000000 65535 f \n'.encode()
+    pdf += ''.join(f'{offset:010d} 00000 n \n' for offset in offsets).encode()
+    pdf += (f'trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\n'
+            f'startxref\n{xref}\n%%EOF\n').encode()
+    return pdf
+
+
+test_input = [
+    pytest.param(sample1, id='mid-year'),
+    pytest.param(sample2, id='transition'),
+]
+
+
+@pytest.mark.parametrize('sample', test_input)
+def test_pdfminer_parity_with_tika(tmp_path, sample):
+    '''Transactions parsed from pdfminer text of a statement laid out as the
+    original match those parsed from tika's text of the original.'''
+    pytest.importorskip('pdfminer')
+    url = tmp_path / 'statement.pdf'
+    url.write_bytes(make_pdf(sample['statement_text']))
+
+    text = extract_text(url, 'pdfminer')
+    dates = get_statement_dates(text)
+    assert dates == get_statement_dates(sample['statement_text'])
+    assert list(get_transactions(text, *dates)) == \
+        list(get_transactions(sample['statement_text'], *dates))
+
+
+def test_unknown_engine(tmp_path):
+    with pytest.raises(ValueError):
+        extract_text(tmp_path / 'statement.pdf', 'unknown')
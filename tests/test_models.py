@@ -7,7 +7,7 @@ import pytest
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm.exc import NoResultFound
 from tally.models import ActiveUser, Bill, Category, User, engine, session
-from tally.utils import new_bill
+from tally.utils import insert_bills, new_bill
 
 
 def test_basic_query(sample_db):
@@ -90,3 +90,15 @@ def test_active_user_update(sample_db):
     new_active_user = session.query(ActiveUser).first().user
     new_active_user_bills = new_active_user.bills
     assert new_active_user_bills[0].descr == 'petro'
+
+
+def test_insert_bills(sample_db):
+    gas_id = session.query(Category.id).filter_by(user_name='scott', name='gas').scalar()
+    bills = [{'date': date(2020, 2, day), 'descr': f'bulk{day}', 'value': day,
+              'user_name': 'scott', 'category_id': gas_id}
+             for day in range(1, 11)]
+    insert_bills(bills)
+    session.commit()
+    test_bills = session.query(Bill).filter(Bill.descr.like('bulk%')).all()
+    assert len(test_bills) == 10
+    assert all(bill.category.name == 'gas' for bill in test_bills)
@@ -1,34 +1,36 @@
 # pylint:disable=[missing-function-docstring, unused-argument]
 
-import copy
 from datetime import date
-from typing import Dict
+from pathlib import Path
 
 import pytest
 from tally import parse
-from tally.parse import get_statement_dates, get_transactions, parse_statement
-
-trans_dict1 = {
-    'Date': [date(2019, 3, 22), date(2019, 3, 23), date(2019, 4, 1),
-             date(2019, 3, 23), date(2019, 3, 27), date(2019, 4, 10),
-             date(2019, 4, 12)],
-    'Description': ['TIM HORTONS TORONTO ON', 'PETROCAN TORONTO ON',
-                    'PAYMENT - THANK YOU / PAIEMENT - MERCI', 'CANADIAN TIRE TORONTO ON',
-                    'REN\'S PET DEPOT TORONTO ON', 'GREASY PIZZA PLACE TORONTO ON',
-                    'SHELL TORONTO ON'],
-    'Value': [44.71, 16.27, -143.66, 28.56, 34.94, 25.03, 43.79]
-}
+from tally.parse import (Transaction, find_statements, get_statement_dates,
+                         get_transactions, number_occurrences, parse_statement,
+                         parse_statements, read_csv, read_ofx, read_statement,
+                         read_statements)
+
+transactions1 = [
+    Transaction(date(2019, 3, 22), 'TIM HORTONS TORONTO ON', 44.71),
+    Transaction(date(2019, 3, 23), 'PETROCAN TORONTO ON', 16.27),
+    Transaction(date(2019, 4, 1), 'PAYMENT - THANK YOU / PAIEMENT - MERCI', -143.66),
+    Transaction(date(2019, 3, 23), 'CANADIAN TIRE TORONTO ON', 28.56),
+    Transaction(date(2019, 3, 27), 'REN\'S PET DEPOT TORONTO ON', 34.94),
+    Transaction(date(2019, 4, 10), 'GREASY PIZZA PLACE TORONTO ON', 25.03),
+    Transaction(date(2019, 4, 12), 'SHELL TORONTO ON', 43.79),
+]
 
-trans_dict2 = copy.deepcopy(trans_dict1)
-trans_dict2['Date'] = [date(2019, 12, 20), date(2019, 12, 23), date(2020, 1, 1),
-                       date(2019, 12, 28), date(2020, 1, 5), date(2020, 1, 6),
-                       date(2020, 1, 10)]
+dates2 = [date(2019, 12, 20), date(2019, 12, 23), date(2020, 1, 1),
+          date(2019, 12, 28), date(2020, 1, 5), date(2020, 1, 6),
+          date(2020, 1, 10)]
+transactions2 = [trans._replace(date=trans_date)
+                 for trans, trans_date in zip(transactions1, dates2)]
 
 sample1 = {
     'url': 'tests/data/sample_statement_text1.txt',
     'start_date': date(2019, 3, 20),
     'end_date': date(2019, 4, 22),
-    'trans_dict': trans_dict1
+    'transactions': transactions1
 }
 with open(str(sample1['url'])) as file:
     sample1['statement_text'] = file.read()
@@ -37,7 +39,7 @@ sample2 = {
     'url': 'tests/data/sample_statement_text2.txt',
     'start_date': date(2019, 12, 20),
     'end_date': date(2020, 1, 20),
-    'trans_dict': trans_dict2
+    'transactions': transactions2
 }
 with open(str(sample2['url'])) as file:
     sample2['statement_text'] = file.read()
@@ -60,34 +62,217 @@ def test_get_statement_dates(statement_text, start_date, end_date):
 
 test_input = [
     pytest.param(sample1['statement_text'], sample1['start_date'], sample1['end_date'],
-                 sample1['trans_dict'], id='mid-year'),
+                 sample1['transactions'], id='mid-year'),
     pytest.param(sample2['statement_text'], sample2['start_date'], sample2['end_date'],
-                 sample2['trans_dict'], id='transition')
+                 sample2['transactions'], id='transition')
 ]
 
 
-@pytest.mark.parametrize('statement_text,start_date,end_date,trans_dict', test_input)
-def test_get_transactions(statement_text, start_date, end_date, trans_dict):
-    test_trans_dict = get_transactions(statement_text, start_date, end_date)
-    assert test_trans_dict == trans_dict
+@pytest.mark.parametrize('statement_text,start_date,end_date,transactions', test_input)
+def test_get_transactions(statement_text, start_date, end_date, transactions):
+    test_transactions = get_transactions(statement_text, start_date, end_date)
+    assert list(test_transactions) == transactions
+
+
+def test_get_transactions_no_match():
+    with pytest.raises(ValueError):
+        list(get_transactions('no transactions', date(2020, 1, 1), date(2020, 2, 1)))
 
 
 test_input = [
     pytest.param(sample1['url'],
-                 sample1['statement_text'], sample1['trans_dict'], id='mid-year'),
+                 sample1['statement_text'], sample1['transactions'], id='mid-year'),
     pytest.param(sample2['url'], sample2['statement_text'],
-                 sample2['trans_dict'], id='transition')
+                 sample2['transactions'], id='transition')
+]
+
+
+@pytest.mark.parametrize('statement_url,statement_text, transactions', test_input)
+def test_parse_statement(monkeypatch, statement_url, statement_text, transactions):
+    def mock_extract_text(url: Path, engine: str) -> str:
+        '''Mock tika server response'''
+        return statement_text
+
+    monkeypatch.setattr(parse, 'extract_text', mock_extract_text)
+    test_transactions = parse_statement(statement_url)
+    assert test_transactions == transactions
+
+
+def test_parse_statements(monkeypatch):
+    def mock_extract_text(url: Path, engine: str) -> str:
+        '''Mock tika server response, selecting statement text by url'''
+        sample = sample1 if url == Path(sample1['url']) else sample2
+        return sample['statement_text']
+
+    monkeypatch.setattr(parse, 'extract_text', mock_extract_text)
+    test_transactions = parse_statements([sample1['url'], sample2['url']],
+                                         max_workers=1)
+    assert list(test_transactions) == (sample1['transactions'] +
+                                       sample2['transactions'])
+
+
+def test_find_statements(tmp_path):
+    for name in ['b.pdf', 'a.PDF', 'c.csv', 'd.qfx', 'notes.txt']:
+        (tmp_path / name).touch()
+    other = tmp_path / 'other.pdf'
+    test_statements = find_statements([tmp_path, other])
+    assert test_statements == [tmp_path / 'a.PDF', tmp_path / 'b.pdf',
+                               tmp_path / 'c.csv', tmp_path / 'd.qfx', other]
+
+
+def test_parse_statement_cached(monkeypatch):
+    calls = []
+
+    def mock_extract_text(url: Path, engine: str) -> str:
+        '''Mock tika server response, recording each extraction'''
+        calls.append(url)
+        return sample1['statement_text']
+
+    monkeypatch.setattr(parse, 'extract_text', mock_extract_text)
+    assert parse_statement(sample1['url']) == sample1['transactions']
+    assert parse_statement(sample1['url']) == sample1['transactions']
+    assert len(calls) == 1
+    assert parse_statement(sample1['url'], use_cache=False) == sample1['transactions']
+    assert len(calls) == 2
+
+    # results of earlier parser versions are not reused
+    monkeypatch.setattr(parse, 'PARSER_VERSION', parse.PARSER_VERSION + 1)
+    assert parse_statement(sample1['url']) == sample1['transactions']
+    assert len(calls) == 3
+
+
+def test_read_statement(monkeypatch):
+    monkeypatch.setattr(parse, 'extract_text', lambda url, engine: sample1['statement_text'])
+    for _ in range(2):  # uncached, then cached
+        statement = read_statement(sample1['url'])
+        assert statement.file_hash == parse.cache.file_hash(Path(sample1['url']))
+        assert statement.start_date == sample1['start_date']
+        assert statement.end_date == sample1['end_date']
+        assert statement.transactions == sample1['transactions']
+
+
+def test_number_occurrences():
+    trans = Transaction(date(2020, 1, 1), 'ZEHRS', 10.0)
+    other = trans._replace(value=20.0)
+    numbered = number_occurrences([trans, other, trans, trans])
+    assert [num.occurrence for num in numbered] == [0, 0, 1, 2]
+    assert len({num.fingerprint() for num in numbered}) == 4
+    assert trans.fingerprint() == Transaction(date(2020, 1, 1), 'ZEHRS', 10).fingerprint()
+
+
+# csv downloads give no statement period, which is taken from their transactions
+test_input = [
+    pytest.param('tests/data/sample_statement1.csv', date(2019, 3, 22),
+                 date(2019, 4, 12), id='csv'),
+    pytest.param('tests/data/sample_statement1.ofx', sample1['start_date'],
+                 sample1['end_date'], id='ofx (sgml)'),
+    pytest.param('tests/data/sample_statement1.qfx', sample1['start_date'],
+                 sample1['end_date'], id='qfx (xml)'),
+]
+
+
+@pytest.mark.parametrize('statement_url,start_date,end_date', test_input)
+def test_read_statement_download(monkeypatch, statement_url, start_date, end_date):
+    def mock_extract_text(url: Path, engine: str) -> str:
+        raise AssertionError('Text extraction is not required')
+
+    monkeypatch.setattr(parse, 'extract_text', mock_extract_text)
+    monkeypatch.setattr(parse, 'prepare_engine', mock_extract_text)
+    statement = read_statement(statement_url)
+    assert statement.start_date == start_date
+    assert statement.end_date == end_date
+    assert statement.transactions == sample1['transactions']
+    statements = read_statements([statement_url, statement_url], max_workers=2)
+    assert statements == [statement, statement]
+
+
+def test_read_csv_missing_columns(tmp_path):
+    url = tmp_path / 'statement.csv'
+    url.write_text('Date,Amount\n2019-03-22,-44.71\n')
+    with pytest.raises(ValueError):
+        list(read_csv(url))
+
+
+def test_read_csv_account(tmp_path):
+    url = tmp_path / 'statement.csv'
+    url.write_text('Account Type,Account Number,Transaction Date,Description 1,'
+                   'Description 2,CAD$\n'
+                   'Visa,4510111111111111,1/1/2020,ZEHRS,,-10.00\n'
+                   'MasterCard,5191111111112222,1/2/2020,SHELL,,-20.00\n'
+                   'Chequing,01234-5678901,1/3/2020,DEPOSIT,,100.00\n')
+    assert [trans.descr for trans in read_csv(url)] == ['ZEHRS', 'SHELL']
+    assert [trans.descr for trans in read_csv(url, '2222')] == ['SHELL']
+    assert [trans.descr for trans in read_csv(url, '01234-5678901')] == ['DEPOSIT']
+
+
+def test_read_ofx_account():
+    url = Path('tests/data/sample_statement1.ofx')
+    assert len(list(read_ofx(url, '1111'))) == len(sample1['transactions'])
+    assert not list(read_ofx(url, '2222'))
+
+
+def test_read_ofx_period(tmp_path):
+    # the statement period is widened to cover transactions outside of it
+    url = tmp_path / 'statement.ofx'
+    url.write_text('<OFX><BANKTRANLIST><DTSTART>20200101<DTEND>20200131'
+                   '<STMTTRN><DTPOSTED>20200102<DTUSER>20191231<TRNAMT>-1.50'
+                   '<NAME>A &amp; W</STMTTRN></BANKTRANLIST></OFX>')
+    statement = read_statement(url)
+    assert (statement.start_date, statement.end_date) == (date(2019, 12, 31), date(2020, 1, 31))
+
+
+def test_read_ofx_entities(tmp_path):
+    url = tmp_path / 'statement.ofx'
+    url.write_text('<OFX><STMTTRN><DTPOSTED>20200101<TRNAMT>-1.50'
+                   '<NAME>A &amp; W</STMTTRN></OFX>')
+    assert list(read_ofx(url)) == [Transaction(date(2020, 1, 1), 'A & W', 1.5)]
+
+
+test_input = [
+    pytest.param(b'OFXHEADER:100\r\nENCODING:USASCII\r\nCHARSET:1252\r\n\r\n',
+                 'cp1252', id='sgml code page'),
+    pytest.param(b'OFXHEADER:100\r\nENCODING:USASCII\r\nCHARSET:ISO-8859-1\r\n\r\n',
+                 'latin-1', id='sgml charset'),
+    pytest.param(b'OFXHEADER:100\r\nENCODING:UTF-8\r\nCHARSET:NONE\r\n\r\n',
+                 'utf-8', id='sgml utf-8'),
+    pytest.param(b'<?xml version="1.0" encoding="windows-1252"?>\n', 'cp1252',
+                 id='xml encoding'),
+    pytest.param(b'<?xml version="1.0"?>\n', 'utf-8', id='xml default'),
 ]
 
 
-@pytest.mark.parametrize('statement_url,statement_text, trans_dict', test_input)
-def test_parse_statement(monkeypatch, statement_url, statement_text, trans_dict):
-    class MockTika:
-        '''Mock Tika.parser response'''
-        @staticmethod
-        def from_file(url: str) -> Dict[str, str]:
-            return {'content': statement_text}
+@pytest.mark.parametrize('header,encoding', test_input)
+def test_read_ofx_encoding(tmp_path, header, encoding):
+    url = tmp_path / 'statement.ofx'
+    url.write_bytes(header + '<OFX><STMTTRN><DTPOSTED>20200101<TRNAMT>-2.25'
+                    '<NAME>CAF\u00c9 \u00c0 LA CR\u00c8ME</STMTTRN></OFX>'.encode(encoding))
+    assert list(read_ofx(url)) == \
+        [Transaction(date(2020, 1, 1), 'CAF\u00c9 \u00c0 LA CR\u00c8ME', 2.25)]
+
+
+def test_read_ofx_unknown_charset(tmp_path):
+    url = tmp_path / 'statement.ofx'
+    url.write_bytes(b'OFXHEADER:100\r\nCHARSET:9999\r\n\r\n<OFX></OFX>')
+    with pytest.raises(ValueError):
+        list(read_ofx(url))
+
+
+def test_read_statements_on_error(tmp_path):
+    url = tmp_path / 'statement.ofx'
+    url.write_text('<OFX><STMTTRN><NAME>A &amp; W</STMTTRN></OFX>')
+    errors = []
+    statements = read_statements(
+        [url, 'tests/data/sample_statement1.csv'],
+        on_error=lambda url, err: errors.append((url, str(err))))
+    assert errors == [(url, 'Missing field(s) in ofx transaction: DTPOSTED, TRNAMT.')]
+    assert [statement.transactions for statement in statements] == \
+        [sample1['transactions']]
+    with pytest.raises(ValueError):
+        read_statements([url])
+
 
-    monkeypatch.setattr(parse, 'parser', MockTika)
-    test_trans_dict = parse_statement(statement_url)
-    assert test_trans_dict == trans_dict
+def test_read_statement_empty(tmp_path):
+    url = tmp_path / 'statement.ofx'
+    url.write_text('<OFX></OFX>')
+    with pytest.raises(ValueError):
+        read_statement(url)
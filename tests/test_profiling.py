@@ -0,0 +1,95 @@
+#pylint:disable=[missing-function-docstring, redefined-outer-name, unused-argument]
+import json
+import pstats
+import tracemalloc
+
+import pytest
+from tally.models import Category, session
+from tally.parse import read_statements
+from tally.profiling import Profiler, profiler as cli_profiler
+from tally.review import TransData
+
+
+@pytest.fixture
+def profiler():
+    '''The profiler of instrumented stages, running until the end of the test.'''
+    cli_profiler.start()
+    yield cli_profiler
+    cli_profiler.stop()
+
+
+def test_disabled():
+    disabled = Profiler()
+    with disabled.stage('unused'):
+        pass
+    assert disabled.enabled is False
+    assert disabled.report()['stages'] == {}
+
+
+def test_stages(profiler):
+    for _ in range(2):
+        with profiler.stage('outer'):
+            with profiler.stage('inner'):
+                data = list(range(100_000))
+            del data
+    stages = profiler.report()['stages']
+    assert stages['outer']['calls'] == stages['inner']['calls'] == 2
+    assert stages['outer']['wall_ms'] >= stages['inner']['wall_ms'] > 0
+    assert stages['outer']['peak_mb'] >= stages['inner']['peak_mb'] > 1
+
+
+def test_stages_without_reset_peak(profiler, monkeypatch):
+    # tracemalloc.reset_peak is not available before python 3.9
+    monkeypatch.delattr(tracemalloc, 'reset_peak', raising=False)
+    with profiler.stage('outer'):
+        with profiler.stage('inner'):
+            data = list(range(100_000))
+        del data
+    stages = profiler.report()['stages']
+    assert stages['outer']['peak_mb'] >= stages['inner']['peak_mb'] > 1
+
+
+def test_stage_exception(profiler):
+    with pytest.raises(ValueError):
+        with profiler.stage('failed'):
+            raise ValueError()
+    assert profiler.report()['stages']['failed']['calls'] == 1
+
+
+def test_sql(sample_db, profiler):
+    with profiler.stage('query'):
+        session.query(Category).filter_by(user_name='scott').all()
+        session.query(Category).filter_by(user_name='sarah').all()
+    report = profiler.report()
+    assert report['stages']['query']['sql_count'] == 2
+    assert report['sql']['count'] == 2
+    assert len(report['sql']['statements']) == 1
+    assert report['sql']['statements'][0]['count'] == 2
+
+
+def test_instrumented_stages(sample_db, profiler):
+    TransData('scott').summarize_all()
+    stages = profiler.report()['stages']
+    assert stages['TransData.__init__']['sql_count'] == 1
+    assert stages['summarize_all']['sql_count'] == 0
+
+
+def test_parallel_stages(profiler):
+    # statements are read in the profiled process, rather than in workers
+    read_statements(['tests/data/sample_statement1.csv', 'tests/data/sample_statement1.ofx'],
+                    max_workers=2)
+    stages = profiler.report()['stages']
+    assert stages['parse_statement']['calls'] == 2
+    assert stages['read_csv']['calls'] == stages['read_ofx']['calls'] == 1
+
+
+def test_stop(tmp_path, sample_db):
+    report_path, stats_path = tmp_path / 'report.json', tmp_path / 'stats.prof'
+    cli_profiler.start(stats_path)
+    TransData('scott')
+    cli_profiler.stop(str(report_path))
+    assert cli_profiler.enabled is False
+    report = json.loads(report_path.read_text())
+    assert set(report) == {'command', 'wall_ms', 'cpu_ms', 'peak_mb', 'stages', 'sql'}
+    assert 'TransData.__init__' in report['stages']
+    assert pstats.Stats(str(stats_path)).total_calls > 0
@@ -0,0 +1,67 @@
+#pylint:disable=[missing-function-docstring, unused-argument]
+import pytest
+from tally.models import Bill, session
+from tally.reclassify import find_reclassifications, reclassify
+from tally.rules import add_rule
+from tally.totals import check_totals
+
+MSG_SUMMARY = '''
+Reclassifications:
+------------------
+misc -> groceries: 2 bills
+groceries -> gas: 1 bills
+'''.strip('\n')
+
+
+def _bill_categs():
+    return {bill.descr: bill.category.name
+            for bill in session.query(Bill).filter_by(user_name='scott')}
+
+
+@pytest.fixture
+def sample_rules(sample_db):
+    add_rule('walmart', 'groceries')
+    add_rule('ren', 'groceries')
+    add_rule('zehrs', 'gas')
+    add_rule('^sob', 'groceries', is_regex=True)
+
+
+def test_find_reclassifications(sample_rules):
+    changes = find_reclassifications(chunk_size=2)
+    assert len(changes) == 3
+    assert list(changes.columns) == ['id', 'old', 'new']
+
+
+def test_find_reclassifications_no_rules(sample_db):
+    assert find_reclassifications().empty
+
+
+def test_reclassify(sample_rules):
+    msg = reclassify(no_confirm=True, chunk_size=2)
+    assert msg == f'{MSG_SUMMARY}\n\n3 bills reclassified successfully.'
+    assert _bill_categs() == {'zehrs': 'gas', 'walmart': 'groceries',
+                              'ren\'s': 'groceries', 'sobeys': 'groceries'}
+    assert check_totals().startswith('Monthly totals are consistent')
+    assert reclassify(no_confirm=True) == \
+        'All bills matching a rule are already in its category.'
+
+
+def test_reclassify_dry_run(sample_rules):
+    msg = reclassify(no_confirm=True, dry_run=True)
+    assert msg == f'{MSG_SUMMARY}\n\n3 bills would be reclassified.'
+    assert _bill_categs()['walmart'] == 'misc'
+
+
+test_input = [
+    pytest.param('y', '3 bills reclassified successfully.', 'groceries', id='confirm'),
+    pytest.param('n', 'Process aborted during confirmation of changes.', 'misc', id='abort'),
+]
+
+
+@pytest.mark.parametrize('answer,output_msg,walmart_categ', test_input)
+def test_reclassify_confirm(sample_rules, monkeypatch, answer, output_msg, walmart_categ):
+    prompts = []
+    monkeypatch.setattr('builtins.input', lambda prompt: prompts.append(prompt) or answer)
+    assert reclassify(no_confirm=False) == output_msg
+    assert prompts == [f'{MSG_SUMMARY}\n\nApply changes? ([y]/n)']
+    assert _bill_categs()['walmart'] == walmart_categ
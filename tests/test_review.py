@@ -1,9 +1,13 @@
 #pylint:disable=[missing-function-docstring, unused-argument]
 
+from datetime import date
 from math import isclose
 
 import pandas as pd
-from tally.review import TransData
+import pytest
+from tally.models import Category, session
+from tally.review import TransData, summarize_monthly_totals
+from tally.utils import new_bill
 
 
 def test_init(review_db):
@@ -62,3 +66,60 @@ def test_summarize_all(review_db):
         assert pivot.iloc[ind].to_list() == test_df.iloc[ind].to_list()
     for ind in range(3):
         assert isclose(pivot.iloc[-1, ind], test_df.iloc[-1, ind])
+
+
+def test_summarize_all_month_order(sample_db):
+    # months are sorted chronologically within each year, not by name
+    session.add_all([
+        new_bill(date(2020, month, 1), 'zehrs', month, 'scott', 'groceries')
+        for month in [8, 4, 12, 2]])
+    session.commit()
+    pivot = TransData('scott').summarize_all()
+    assert pivot.index.to_list() == [
+        (2020, 'January'), (2020, 'February'), (2020, 'April'),
+        (2020, 'August'), (2020, 'December'), ('Average', '')]
+    assert pivot['groceries'].to_list()[:-1] == [500, 2, 4, 8, 12]
+
+
+def test_init_date_range(review_db):
+    data = TransData('scott', start=date(2020, 1, 1), end=date(2020, 1, 31)).data
+    assert len(data) == 6
+    assert data.index.min() == pd.Timestamp(2020, 1, 1)
+    assert data.index.max() == pd.Timestamp(2020, 1, 31)
+
+
+def test_init_category(review_db):
+    data = TransData('scott', category='groceries').data
+    assert data['Description'].to_list() == ['zehrs', 'sobeys']
+
+
+def test_hidden_category_per_user(review_db):
+    # hiding a category only affects the user it belongs to
+    session.query(Category).filter_by(name='gas', user_name='scott').\
+        update({'hidden': True})
+    session.commit()
+    data = TransData('sarah').data
+    assert data['Category'].to_list().count('gas') == 2
+
+
+test_input = [
+    pytest.param(False, False, id='default'),
+    pytest.param(True, False, id='show_hidden'),
+    pytest.param(False, True, id='filter_edges'),
+]
+
+
+@pytest.mark.parametrize('show_hidden,filter_edges', test_input)
+def test_summarize_monthly_totals(review_db, show_hidden, filter_edges):
+    trans_data = TransData('scott', show_hidden=show_hidden)
+    if filter_edges:
+        trans_data.filter_first_and_last_month()
+    expected = trans_data.summarize_all()
+    pivot = summarize_monthly_totals('scott', show_hidden, filter_edges)
+    pd.testing.assert_frame_equal(pivot, expected)
+    assert str(pivot) == str(expected)
+
+
+def test_summarize_monthly_totals_insufficient_data(sample_db):
+    with pytest.raises(ValueError):
+        summarize_monthly_totals('scott', filter_edges=True)
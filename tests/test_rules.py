@@ -0,0 +1,148 @@
+#pylint:disable=[missing-function-docstring, unused-argument]
+from contextlib import nullcontext
+from datetime import date
+
+import pytest
+from click.testing import CliRunner
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import NoResultFound
+from tally import categ
+from tally.categ import categorize
+from tally.cli import cli
+from tally.models import Bill, Rule, session
+from tally.parse import Transaction
+from tally.rules import RuleMatcher, add_rule, delete_rule, get_matcher, get_rules
+
+test_input = [
+    pytest.param('TIM HORTONS TORONTO ON', 'coffee', id='substring'),
+    pytest.param('tim hortons toronto on', 'coffee', id='ignore case'),
+    pytest.param('SHELL TORONTO ON', 'gas', id='regex'),
+    pytest.param('PETRO-CANADA 123', 'gas', id='regex alternative'),
+    pytest.param('GREASY PIZZA PLACE', None, id='no match'),
+    pytest.param('SHELL AT TIM HORTONS', 'gas', id='earliest match wins'),
+    pytest.param('TIMS (A+B) SHOP', 'misc', id='escaped substring'),
+]
+
+
+@pytest.mark.parametrize('descr,categ_name', test_input)
+def test_rule_matcher(descr, categ_name):
+    matcher = RuleMatcher([
+        ('tim hortons', False, 'coffee'),
+        (r'^(shell|petro-?can)', True, 'gas'),
+        ('(a+b)', False, 'misc'),
+    ])
+    assert matcher.match(descr) == categ_name
+
+
+def test_rule_matcher_empty():
+    assert RuleMatcher([]).match('anything') is None
+
+
+test_input = [
+    pytest.param(add_rule, ('zehrs', 'groceries'), ['sobeys', 'zehrs'],
+                 nullcontext(), id='add_rule_valid'),
+    pytest.param(add_rule, ('sobeys', 'groceries'), ['sobeys'],
+                 pytest.raises(IntegrityError), id='add_rule_duplicate'),
+    pytest.param(add_rule, ('zehrs', 'unknown'), ['sobeys'],
+                 pytest.raises(NoResultFound), id='add_rule_unknown_categ'),
+    pytest.param(delete_rule, (1,), [],
+                 nullcontext(), id='delete_rule_valid'),
+    pytest.param(delete_rule, (2,), ['sobeys'],
+                 pytest.raises(NoResultFound), id='delete_rule_non_existing'),
+]
+
+
+@pytest.mark.parametrize('func,args,pattern_list,context', test_input)
+def test_rule_operation(sample_db, func, args, pattern_list, context):
+    session.add(Rule(pattern='sobeys', user_name='scott', category_id=1))
+    session.commit()
+    with context:
+        func(*args)
+    session.rollback()
+    assert [rule.pattern for rule in get_rules()] == pattern_list
+
+
+test_input = [
+    pytest.param('(unclosed', 'missing ), unterminated subpattern', id='invalid'),
+    pytest.param('(?i)shell', 'inline flags are not supported', id='inline_flags'),
+    pytest.param('(?P<name>shell)', 'named groups are not supported', id='named_group'),
+    pytest.param(r'(ab)\1', 'backreferences are not supported', id='backreference'),
+]
+
+
+@pytest.mark.parametrize('pattern,error', test_input)
+def test_add_rule_invalid_regex(sample_db, pattern, error):
+    add_rule('zehrs', 'groceries')
+    msg = add_rule(pattern, 'misc', is_regex=True)
+    assert msg.startswith(f'Invalid regular expression "{pattern}": {error}')
+    assert [rule.pattern for rule in get_rules()] == ['zehrs']
+    assert get_matcher('scott').match('ZEHRS') == 'groceries'
+
+
+test_input = [
+    pytest.param('(?i:shell)', 'SHELL TORONTO', id='scoped_flags'),
+    pytest.param('(ab)+', 'ABAB', id='numbered_group'),
+    pytest.param(r'\\1', '\\1', id='escaped_backslash'),
+]
+
+
+@pytest.mark.parametrize('pattern,descr', test_input)
+def test_add_rule_combined_regex(sample_db, pattern, descr):
+    add_rule('zehrs', 'groceries')
+    assert add_rule(pattern, 'misc', is_regex=True).endswith('added successfully.')
+    assert get_matcher('scott').match(descr) == 'misc'
+
+
+def test_rule_list_queries_constant(sample_db, sql_statements):
+    runner = CliRunner()
+    counts = []
+    for categ_names in [['gas'], ['gas', 'groceries', 'misc'] * 5]:
+        for ind, categ_name in enumerate(categ_names):
+            add_rule(f'{categ_name}{len(counts)}-{ind}', categ_name)
+        session.expire_all()
+        sql_statements.clear()
+        result = runner.invoke(cli, 'rule list'.split())
+        assert result.exit_code == 0
+        counts.append(len(sql_statements))
+    assert counts[0] == counts[1]
+
+
+def test_get_matcher(sample_db):
+    add_rule('zehrs', 'groceries')
+    add_rule('wal.?mart', 'misc', is_regex=True)
+    session.add(Rule(pattern='zehrs', user_name='sarah', category_id=6))
+    session.commit()
+    matcher = get_matcher('scott')
+    assert matcher.match('ZEHRS #123') == 'groceries'
+    assert matcher.match('WAL-MART') == 'misc'
+
+
+transactions = [
+    Transaction(date(2020, 1, 1), 'COFFEE SHOP', 1),
+    Transaction(date(2020, 1, 2), 'Sample_description_2', 2),
+]
+
+
+def test_categorize_rule_default(empty_db, monkeypatch):
+    add_rule('coffee', 'category2')
+    picks = []
+
+    def _mock_pick(categories, message, default_index=0):
+        picks.append(default_index)
+        return (categories[default_index], default_index)
+    monkeypatch.setattr(categ, 'pick', _mock_pick)
+
+    msg = categorize(transactions, True)
+    assert msg == '2 transactions added successfully.'
+    # the second default is suggested from the history of the first transaction
+    assert picks == [1, 1]
+    assert session.query(Bill).filter_by(descr='COFFEE SHOP').one().\
+        category.name == 'category2'
+
+
+def test_categorize_rule_auto(empty_db, mock_pick):
+    add_rule('coffee', 'category1')
+    msg = categorize(transactions, True, auto_assign=True)
+    assert msg == '2 transactions added successfully (1 categorized by rules).'
+    test_bills = session.query(Bill).order_by(Bill.date).all()
+    assert [bill.category.name for bill in test_bills] == ['category1', 'category2']
@@ -0,0 +1,36 @@
+#pylint:disable=[missing-function-docstring, unused-argument]
+from datetime import date
+
+from tally import cache
+from tally.models import Statement, session
+from tally.parse import StatementData
+from tally.statements import filter_imported, get_imported_hashes, record_statements
+
+
+def make_statement(file_hash):
+    return StatementData(file_hash, date(2020, 1, 1), date(2020, 1, 31), [])
+
+
+def test_record_statements(sample_db):
+    record_statements([make_statement('a'), make_statement('b'), make_statement('a')],
+                      'scott')
+    record_statements([make_statement('b')], 'scott')
+    record_statements([make_statement('a')], 'sarah')
+    session.commit()
+    assert session.query(Statement).count() == 3
+    assert get_imported_hashes('scott') == {'a', 'b'}
+    assert get_imported_hashes('sarah') == {'a'}
+
+
+def test_filter_imported(sample_db, tmp_path):
+    urls = []
+    for name, text in [('a.pdf', 'a'), ('b.pdf', 'b'), ('copy_of_a.pdf', 'a')]:
+        url = tmp_path / name
+        url.write_text(text)
+        urls.append(url)
+    assert filter_imported(urls, 'scott') == (urls[:2], 1)
+
+    record_statements([make_statement(cache.file_hash(urls[1]))], 'scott')
+    session.commit()
+    assert filter_imported(urls, 'scott') == (urls[:1], 2)
+    assert filter_imported(urls, 'sarah') == (urls[:2], 1)
@@ -0,0 +1,89 @@
+#pylint:disable=[missing-function-docstring, unused-argument]
+from datetime import date
+
+from tally import categ, suggest
+from tally.categ import categorize
+from tally.models import Bill, session
+from tally.parse import Transaction
+from tally.suggest import Classifier, load_classifier, tokenize
+from tally.utils import new_bill
+
+
+def test_tokenize():
+    assert tokenize("REN'S PET DEPOT #1234 TORONTO ON") == \
+        ["ren's", 'pet', 'depot', 'toronto', 'on']
+
+
+def test_classifier_rank():
+    classifier = Classifier()
+    classifier.update([
+        ('ZEHRS TORONTO ON', 1),
+        ('SOBEYS TORONTO ON', 1),
+        ('PETROCAN TORONTO ON', 2),
+        ('SHELL TORONTO ON', 2),
+        ('SHELL OAKVILLE ON', 2),
+    ])
+    assert classifier.n_bills == 5
+    assert classifier.rank('ZEHRS #123 TORONTO ON') == [1, 2]
+    assert classifier.rank('SHELL TORONTO ON') == [2, 1]
+    # fall back to the most common category for unknown words
+    assert classifier.rank('UNKNOWN MERCHANT') == [2, 1]
+    assert Classifier().rank('ZEHRS') == []
+
+
+def test_classifier_json_roundtrip():
+    classifier = Classifier()
+    classifier.update([('ZEHRS TORONTO', 1), ('SHELL TORONTO', 2)])
+    restored = Classifier.from_json(classifier.to_json())
+    assert restored.n_bills == 2
+    assert restored.rank('ZEHRS') == classifier.rank('ZEHRS') == [1, 2]
+
+
+def test_load_classifier(sample_db):
+    classifier = load_classifier('scott')
+    assert classifier.n_bills == 4
+    assert suggest._model_path('scott').exists()
+
+    # the saved classifier is used while in sync with the bill history
+    suggest.save_classifier('scott', Classifier.from_json(
+        {**classifier.to_json(), 'categ_counts': [(2, 4)]}))
+    assert load_classifier('scott').categ_counts == {2: 4}
+
+    # and retrained once out of sync
+    session.add(new_bill(date(2020, 2, 1), 'zehrs', 1, 'scott', 'groceries'))
+    session.commit()
+    classifier = load_classifier('scott')
+    assert classifier.n_bills == 5
+    assert classifier.categ_counts == {1: 3, 3: 2}
+
+    # or once trained on a category which no longer exists
+    suggest.save_classifier('scott', Classifier.from_json(
+        {**classifier.to_json(), 'categ_counts': [(1, 3), (99, 2)]}))
+    assert load_classifier('scott').categ_counts == {1: 3, 3: 2}
+
+
+def test_delete_categ_invalidates(sample_db):
+    load_classifier('scott')
+    categ.delete_categ('groceries')
+    assert not suggest._model_path('scott').exists()
+
+
+def test_categorize_suggestion_default(empty_db, monkeypatch):
+    picks = []
+
+    def _mock_pick(categories, message, default_index=0):
+        '''Select category2 for the first transaction, then accept the default'''
+        picks.append(default_index)
+        index = 1 if len(picks) == 1 else default_index
+        return (categories[index], index)
+    monkeypatch.setattr(categ, 'pick', _mock_pick)
+
+    transactions = [
+        Transaction(date(2020, 1, 1), 'COFFEE SHOP', 1),
+        Transaction(date(2020, 1, 2), 'COFFEE SHOP', 2),
+    ]
+    categorize(transactions, True)
+    assert picks == [0, 1]
+    assert [bill.category.name for bill in session.query(Bill).all()] == \
+        ['category2', 'category2']
+    assert load_classifier('scott').n_bills == 2
@@ -0,0 +1,82 @@
+#pylint:disable=[missing-function-docstring, redefined-outer-name, unused-argument]
+import json
+
+import pytest
+import requests
+from tally import tika_server
+
+
+class MockResponse:
+    '''Mock requests.Response'''
+
+    def __init__(self, text: str = ''):
+        self.text = text
+        self.ok = True
+        self.encoding = None
+
+    def raise_for_status(self):
+        pass
+
+
+class MockSession:
+    '''Mock requests.Session, recording the requests made'''
+
+    def __init__(self, running: bool):
+        self.running = running
+        self.requests = []
+
+    def get(self, url, **kwargs):
+        if not self.running:
+            raise requests.ConnectionError()
+        self.requests.append(('get', url))
+        return MockResponse()
+
+    def put(self, url, data, **kwargs):
+        self.requests.append(('put', url))
+        return MockResponse(f'text of {data.read().decode()}')
+
+
+@pytest.fixture
+def server_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(tika_server, 'STATE_FILE', tmp_path / 'state.json')
+    monkeypatch.setattr(tika_server, 'HEARTBEAT_FILE', tmp_path / 'heartbeat')
+    monkeypatch.setattr(tika_server, '_server_ready', False)
+    return tmp_path
+
+
+@pytest.mark.parametrize('running', [True, False])
+def test_is_running(monkeypatch, running):
+    monkeypatch.setattr(tika_server, '_http', MockSession(running))
+    assert tika_server.is_running() is running
+
+
+def test_extract_text_reuses_session(server_files, monkeypatch):
+    session = MockSession(running=True)
+    monkeypatch.setattr(tika_server, '_http', session)
+    statements = []
+    for name in ['a', 'b']:
+        statement = server_files / f'{name}.pdf'
+        statement.write_text(name)
+        statements.append(statement)
+
+    texts = [tika_server.extract_text(statement) for statement in statements]
+    assert texts == ['text of a', 'text of b']
+    # the health check is only issued once per process
+    assert [verb for verb, _ in session.requests] == ['get', 'put', 'put']
+    assert tika_server.HEARTBEAT_FILE.exists()
+
+
+def test_status_not_running(server_files, monkeypatch):
+    monkeypatch.setattr(tika_server, '_http', MockSession(running=False))
+    assert tika_server.server_status() == 'Tika server is not running.'
+    assert tika_server.stop_server() == 'Tika server is not running.'
+
+
+def test_status_running(server_files, monkeypatch):
+    monkeypatch.setattr(tika_server, '_http', MockSession(running=True))
+    tika_server.STATE_FILE.write_text(
+        json.dumps({'pid': -1, 'java_pid': -1, 'idle_timeout': 60}))
+    tika_server.HEARTBEAT_FILE.touch()
+    assert 'idle 0s of 60s' in tika_server.server_status()
+    tika_server.HEARTBEAT_FILE.unlink()
+    assert 'idle unknown of 60s' in tika_server.server_status()
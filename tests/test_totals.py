@@ -0,0 +1,98 @@
+#pylint:disable=[missing-function-docstring, unused-argument]
+from datetime import date
+
+import pytest
+from tally import categ, users
+from tally.models import Bill, Category, MonthlyTotal, session
+from tally.totals import check_totals, rebuild_totals
+from tally.utils import new_bill
+
+
+def get_totals():
+    return {(row.user_name, row.year, row.month, row.category_id): (row.total, row.count)
+            for row in session.query(MonthlyTotal)}
+
+
+def get_categ_id(user_name, categ_name):
+    return session.query(Category.id).filter_by(
+        user_name=user_name, name=categ_name).scalar()
+
+
+def test_insert(sample_db):
+    groceries = get_categ_id('scott', 'groceries')
+    assert get_totals()[('scott', 2020, 1, groceries)] == (500, 2)
+    assert len(get_totals()) == 5
+
+    session.add(new_bill(date(2020, 2, 1), 'zehrs', 50, 'scott', 'groceries'))
+    session.commit()
+    assert get_totals()[('scott', 2020, 2, groceries)] == (50, 1)
+
+
+test_input = [
+    pytest.param({'value': 150}, {('scott', 2020, 1, 'groceries'): (550, 2)},
+                 id='value'),
+    pytest.param({'date': date(2020, 3, 1)},
+                 {('scott', 2020, 1, 'groceries'): (400, 1),
+                  ('scott', 2020, 3, 'groceries'): (100, 1)},
+                 id='date'),
+]
+
+
+@pytest.mark.parametrize('changes,expected', test_input)
+def test_update(sample_db, changes, expected):
+    bill = session.query(Bill).filter_by(descr='zehrs').one()
+    for attr, value in changes.items():
+        setattr(bill, attr, value)
+    session.commit()
+    totals = get_totals()
+    for (user_name, year, month, categ_name), total in expected.items():
+        assert totals[(user_name, year, month,
+                       get_categ_id(user_name, categ_name))] == total
+    assert check_totals().startswith('Monthly totals are consistent')
+
+
+def test_recategorize(sample_db):
+    bill = session.query(Bill).filter_by(descr='zehrs').one()
+    bill.category_id = get_categ_id('scott', 'gas')
+    session.commit()
+    totals = get_totals()
+    assert totals[('scott', 2020, 1, get_categ_id('scott', 'groceries'))] == (400, 1)
+    assert totals[('scott', 2020, 1, get_categ_id('scott', 'gas'))] == (100, 1)
+
+
+def test_delete(sample_db):
+    misc = get_categ_id('scott', 'misc')
+    session.query(Bill).filter_by(descr='walmart').delete()
+    session.commit()
+    assert get_totals()[('scott', 2020, 1, misc)] == (300, 1)
+
+    # totals are removed along with the last bill they include
+    session.query(Bill).filter_by(descr='ren\'s').delete()
+    session.commit()
+    assert ('scott', 2020, 1, misc) not in get_totals()
+
+
+def test_delete_categ(sample_db):
+    groceries = get_categ_id('scott', 'groceries')
+    categ.delete_categ('groceries')
+    assert ('scott', 2020, 1, groceries) not in get_totals()
+    assert check_totals().startswith('Monthly totals are consistent')
+
+
+def test_rename_user(sample_db):
+    users.update_user('scott', 'scotty')
+    totals = get_totals()
+    assert not any(user_name == 'scott' for user_name, *_ in totals)
+    assert totals[('scotty', 2020, 1, get_categ_id('scotty', 'groceries'))] == (500, 2)
+
+
+def test_check_and_rebuild(sample_db):
+    assert check_totals() == 'Monthly totals are consistent with bills (5 rows).'
+    session.query(MonthlyTotal).delete()
+    session.add(MonthlyTotal(user_name='scott', year=2020, month=1,
+                             category_id=get_categ_id('scott', 'groceries'),
+                             total=1, count=2))
+    session.commit()
+    assert check_totals().startswith('5 monthly total(s) are inconsistent')
+    assert rebuild_totals() == 'Monthly totals rebuilt successfully (5 rows).'
+    assert check_totals() == 'Monthly totals are consistent with bills (5 rows).'
@@ -1,10 +1,11 @@
-#pylint:disable=[missing-function-docstring, unused-argument]
+#pylint:disable=[missing-function-docstring, redefined-outer-name, unused-argument]
 from contextlib import nullcontext
 
 import pytest
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm.exc import NoResultFound
-from tally.models import ActiveUser, User, session
+from tally.models import ActiveUser, Bill, Category, MonthlyTotal, User, session
+from tally.totals import check_totals
 from tally.users import add_user, delete_user, set_active_user, update_user
 
 test_input = [
@@ -62,3 +63,23 @@ def test_update_active_user(sample_db, user_name, table_is_empty, active_user, c
         session.rollback()
     new_active_users = session.query(ActiveUser).one()
     assert new_active_users.name == active_user
+
+
+def test_delete_user_cascades(sample_db, sql_statements):
+    delete_user('scott')
+    assert [statement for statement in sql_statements
+            if not statement.lstrip().upper().startswith('SELECT')] == \
+        ['DELETE FROM users WHERE users.name = ?']
+    for model in [Bill, Category, MonthlyTotal]:
+        assert session.query(model).filter_by(user_name='scott').count() == 0
+    assert session.query(ActiveUser).count() == 0
+    assert session.query(Bill).filter_by(user_name='sarah').count() == 4
+    assert check_totals().startswith('Monthly totals are consistent')
+
+
+def test_update_user_cascades(sample_db):
+    update_user('scott', 'new_scott')
+    assert session.query(Bill).filter_by(user_name='new_scott').count() == 4
+    assert session.query(Category).filter_by(user_name='new_scott').count() == 3
+    assert session.query(ActiveUser.name).scalar() == 'new_scott'
+    assert check_totals().startswith('Monthly totals are consistent')